@@ -1,10 +1,21 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Any
+from datetime import datetime
+import asyncio
+import json
+import uuid
 
 from app.services.openai_service import openai_service
 from app.services.redis_service import redis_service
+from app.services.retrieval_gate import RetrievalDecision
+from app.services.single_flight import single_flight
+from app.services.write_queue import message_write_queue
+from app.services.rate_limiter import rate_limiter, RateLimitResult
 from app.core.database import get_db
+from app.core.timing import RequestTimer
 
 router = APIRouter()
 
@@ -17,6 +28,9 @@ class Message(BaseModel):
 
 class ChatRequest(BaseModel):
     message: str
+    # Resume a server-held session; history is then loaded server-side and
+    # conversation_history is ignored
+    conversation_id: Optional[str] = None
     conversation_history: List[Dict[str, str]] = []
     lesson_id: Optional[str] = None
     user_id: Optional[str] = None
@@ -31,82 +45,49 @@ class ChatResponse(BaseModel):
 @router.post("/", response_model=ChatResponse)
 async def chat(
     request: ChatRequest,
+    response: Response,
+    background_tasks: BackgroundTasks,
     db=Depends(get_db),
 ):
     """
     Main chat endpoint for Hebrew AI tutor
     Supports RAG-based responses with conversation history
     """
+    timer = RequestTimer()
     try:
-        # Get user level (default to A1 if not provided)
-        user_level = "A1"
-        if request.user_id:
-            user = await db.user.find_unique(where={"clerkId": request.user_id})
-            if user and user.progress:
-                user_level = user.progress.currentLevel
-
-        # Check rate limit if user_id provided
-        if request.user_id:
-            is_allowed, remaining = await redis_service.check_rate_limit(
-                request.user_id, limit=100, window=3600
-            )
-            if not is_allowed:
-                raise HTTPException(
-                    status_code=429,
-                    detail="Rate limit exceeded. Please try again later.",
-                )
+        # User, history, rate limit and query embedding are independent
+        turn = await _prepare_turn(db, request, timer)
 
         # Get AI response with RAG
         result = await openai_service.hebrew_tutor_response(
             user_message=request.message,
-            conversation_history=request.conversation_history,
-            user_level=user_level,
+            conversation_history=turn["history"],
+            user_level=turn["user_level"],
             lesson_id=request.lesson_id,
+            query_embedding=turn["query_embedding"],
+            timer=timer,
+            conversation_id=request.conversation_id,
+            retrieval=turn["retrieval"],
         )
 
-        # Cache conversation if user_id provided
-        conversation_id = None
-        if request.user_id:
-            # Create or update conversation in database
-            conversation = await db.conversation.create(
-                data={
-                    "userId": request.user_id,
-                    "lessonId": request.lesson_id,
-                }
-            )
-            conversation_id = conversation.id
-
-            # Save messages
-            await db.message.create(
-                data={
-                    "conversationId": conversation_id,
-                    "role": "user",
-                    "content": request.message,
-                }
-            )
-
-            await db.message.create(
-                data={
-                    "conversationId": conversation_id,
-                    "role": "assistant",
-                    "content": result["response"],
-                    "translation": result.get("translation"),
-                }
+        # Cache the exchange before responding, so the client can resume the
+        # conversation right away; the database write happens after the
+        # response is sent
+        conversation_id = turn["conversation_id"]
+        if turn["user"]:
+            await timer.track("cache", _cache_exchange(request, turn, result))
+            background_tasks.add_task(
+                _persist_in_background, request, turn, result
             )
 
-            # Cache in Redis for faster access
-            await redis_service.append_message(
-                conversation_id,
-                {"role": "user", "content": request.message},
-            )
-            await redis_service.append_message(
-                conversation_id,
-                {
-                    "role": "assistant",
-                    "content": result["response"],
-                    "translation": result.get("translation"),
-                },
-            )
+        timer.mark("total")
+        response.headers.update(turn["rate_limit_headers"])
+        response.headers["Server-Timing"] = timer.server_timing()
+        print(
+            f"Chat timing: {timer.as_dict()} "
+            f"retrieval: {result.get('retrieval')} "
+            f"prompt tokens: {result.get('prompt_tokens')}"
+        )
 
         return ChatResponse(
             response=result["response"],
@@ -121,25 +102,231 @@ async def chat(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
-@router.get("/conversation/{conversation_id}")
-async def get_conversation(
-    conversation_id: str,
+@router.post("/stream")
+async def chat_stream(
+    request: ChatRequest,
     db=Depends(get_db),
 ):
-    """Get conversation history"""
+    """
+    Streaming chat endpoint for Hebrew AI tutor (Server-Sent Events)
+    Emits "token" events as the answer is generated and a final "done" event;
+    the exchange is persisted after the stream has been sent
+    """
+    timer = RequestTimer()
     try:
-        # Try Redis cache first
-        cached = await redis_service.get_cached_conversation(conversation_id)
-        if cached:
-            return {"messages": cached}
+        turn = await _prepare_turn(db, request, timer)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error in chat stream endpoint: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    conversation_id = turn["conversation_id"]
+    result: Dict[str, Any] = {}
+
+    async def event_stream():
+        try:
+            async for event in openai_service.hebrew_tutor_response_stream(
+                user_message=request.message,
+                conversation_history=turn["history"],
+                user_level=turn["user_level"],
+                lesson_id=request.lesson_id,
+                query_embedding=turn["query_embedding"],
+                timer=timer,
+                conversation_id=request.conversation_id,
+                retrieval=turn["retrieval"],
+            ):
+                if event["type"] == "token":
+                    timer.mark("first_token", once=True)
+                    yield _sse("token", {"content": event["content"]})
+                else:
+                    result.update(event)
+
+            if turn["user"] and "response" in result:
+                await timer.track("cache", _cache_exchange(request, turn, result))
+            timer.mark("total")
+            yield _sse(
+                "done",
+                {
+                    "response": result.get("response"),
+                    "translation": result.get("translation"),
+                    "conversation_id": conversation_id,
+                    "timing": timer.as_dict(),
+                },
+            )
+        except Exception as e:
+            print(f"Error in chat stream: {e}")
+            yield _sse("error", {"detail": "Internal server error"})
+
+    async def persist_after_stream():
+        print(
+            f"Chat stream timing: {timer.as_dict()} "
+            f"retrieval: {result.get('retrieval')} "
+            f"prompt tokens: {result.get('prompt_tokens')}"
+        )
+        if turn["user"] and "response" in result:
+            await _persist_in_background(request, turn, result)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            **turn["rate_limit_headers"],
+        },
+        background=BackgroundTask(persist_after_stream),
+    )
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """Format a Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _prepare_turn(
+    db, request: ChatRequest, timer: RequestTimer
+) -> Dict[str, Any]:
+    """
+    Run the independent pre-LLM lookups concurrently
+    Returns the user, their level, the prompt history, the query embedding
+    and the conversation id the exchange will be stored under
+    """
+    if request.conversation_id and not request.user_id:
+        # Sessions belong to a learner; anonymous chats send their history
+        raise HTTPException(
+            status_code=401, detail="user_id is required to resume a conversation"
+        )
+
+    retrieval = openai_service.decide_retrieval(
+        request.message,
+        request.conversation_history,
+        request.conversation_id,
+        request.lesson_id,
+    )
+    (user, user_level), (owner_id, history), rate_limit, query_embedding = (
+        await asyncio.gather(
+            timer.track("user_level", _resolve_user(db, request.user_id)),
+            timer.track("history", _load_history(db, request)),
+            timer.track("rate_limit", _enforce_rate_limit(request.user_id)),
+            timer.track("embedding", _embed_query(request, retrieval)),
+        )
+    )
+
+    if request.conversation_id and (not user or owner_id != user.id):
+        # Someone else's session is reported exactly like a missing one
+        raise HTTPException(status_code=404, detail="Conversation not found")
+
+    conversation_id = request.conversation_id
+    if user and not conversation_id:
+        # Generated up front so the client learns it before persistence runs
+        conversation_id = str(uuid.uuid4())
+
+    return {
+        "started_at": datetime.utcnow(),
+        "user": user,
+        "user_level": user_level,
+        "history": history,
+        "query_embedding": query_embedding,
+        "retrieval": retrieval,
+        "rate_limit_headers": rate_limit.headers() if rate_limit else {},
+        "conversation_id": conversation_id,
+        "is_new_conversation": request.conversation_id is None,
+    }
+
+
+async def _embed_query(
+    request: ChatRequest, retrieval: RetrievalDecision
+) -> Optional[List[float]]:
+    """
+    Embed the message for retrieval and the response cache
+    Lesson-scoped turns retrieve the lesson's precomputed context instead,
+    exact vocabulary lookups are answered lexically and gated turns retrieve
+    nothing, so they only need an embedding for a response cache lookup
+    """
+    if not request.message.strip():
+        return None
+    needs_search = (
+        retrieval.retrieve
+        and not request.lesson_id
+        and not openai_service.answers_lexically(request.message)
+    )
+    if not needs_search and not openai_service.uses_response_cache(
+        request.message, request.conversation_history, request.conversation_id
+    ):
+        return None
+    return await openai_service.generate_embedding(request.message)
+
+
+async def _resolve_user(db, user_id: Optional[str]) -> tuple[Any, str]:
+    """Look up the learner and their current level, defaulting to A1"""
+    user = None
+    user_level = "A1"
+    if user_id:
+        user = await db.user.find_unique(
+            where={"clerkId": user_id}, include={"progress": True}
+        )
+        if user and user.progress:
+            user_level = user.progress.currentLevel
+    return user, user_level
+
+
+async def _load_history(
+    db, request: ChatRequest
+) -> tuple[Optional[str], List[Dict[str, str]]]:
+    """
+    History for the prompt: the server-held session, or what the client sent
+    Returns (owner user id, history); the owner is None for new conversations
+    """
+    if not request.conversation_id:
+        return None, request.conversation_history
+
+    owner_id, messages = await asyncio.gather(
+        _conversation_owner(db, request.conversation_id),
+        _load_conversation_messages(db, request.conversation_id),
+    )
+    if owner_id is None or messages is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+
+    history = []
+    for message in messages:
+        content = message["content"]
+        if message.get("translation"):
+            content = f"{content}\n\n{message['translation']}"
+        history.append({"role": message["role"], "content": content})
+    return owner_id, history
+
 
-        # Fall back to database
+async def _conversation_owner(db, conversation_id: str) -> Optional[str]:
+    """User id that owns a conversation, from Redis or Postgres"""
+    owner_id = await redis_service.get_conversation_owner(conversation_id)
+    if owner_id is not None:
+        return owner_id
+
+    conversation = await db.conversation.find_unique(where={"id": conversation_id})
+    if not conversation:
+        return None
+    await redis_service.set_conversation_owner(conversation_id, conversation.userId)
+    return conversation.userId
+
+
+async def _load_conversation_messages(
+    db, conversation_id: str
+) -> Optional[List[Dict[str, Any]]]:
+    """Conversation messages from the Redis cache, falling back to Postgres"""
+    # Try Redis cache first
+    cached = await redis_service.get_cached_conversation(conversation_id)
+    if cached:
+        return cached
+
+    async def load():
         conversation = await db.conversation.find_unique(
-            where={"id": conversation_id}, include={"messages": True}
+            where={"id": conversation_id},
+            include={"messages": {"order_by": {"createdAt": "asc"}}},
         )
 
         if not conversation:
-            raise HTTPException(status_code=404, detail="Conversation not found")
+            return None
 
         messages = [
             {
@@ -149,10 +336,174 @@ async def get_conversation(
                 "created_at": msg.createdAt.isoformat(),
             }
             for msg in conversation.messages
+            # System messages hold the running summary, not chat turns
+            if msg.role != "system"
         ]
 
         # Cache for next time
         await redis_service.cache_conversation(conversation_id, messages)
+        await redis_service.set_conversation_owner(conversation_id, conversation.userId)
+        return messages
+
+    # Fall back to database, once per cold conversation however many
+    # requests miss at the same time
+    return await single_flight.fill(
+        f"conversation:{conversation_id}",
+        load,
+        lambda: redis_service.get_cached_conversation(conversation_id),
+    )
+
+
+async def _enforce_rate_limit(user_id: Optional[str]) -> Optional[RateLimitResult]:
+    """Raise 429 if the user has exceeded the chat rate limit"""
+    if not user_id:
+        return None
+    result = await rate_limiter.check("chat", user_id)
+    if not result.allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded. Please try again later.",
+            headers=result.headers(),
+        )
+    return result
+
+
+async def _persist_in_background(
+    request: ChatRequest, turn: Dict[str, Any], result: Dict[str, Any]
+):
+    """Persist an exchange off the request path, logging instead of raising"""
+    try:
+        await _persist_exchange(request, turn, result)
+    except Exception as e:
+        print(f"Error persisting chat exchange: {e}")
+        return
+
+    # Fold older turns into the conversation summary if it is due. Only
+    # server-held sessions: a new conversation's history came from the
+    # client, is not what the server stores, and would skew summarized_count
+    if turn["is_new_conversation"]:
+        return
+    openai_service.memory.schedule_update(
+        turn["conversation_id"],
+        turn["history"]
+        + [
+            {"role": "user", "content": request.message},
+            {"role": "assistant", "content": result["response"]},
+        ],
+    )
+
+
+async def _persist_exchange(
+    request: ChatRequest,
+    turn: Dict[str, Any],
+    result: Dict[str, Any],
+) -> str:
+    """Queue the user/assistant exchange for the database"""
+    conversation_id = turn["conversation_id"]
+
+    # Resumed sessions append to their existing conversation
+    if turn["is_new_conversation"]:
+        message_write_queue.enqueue_conversation(
+            {
+                "id": conversation_id,
+                "userId": turn["user"].id,
+                "lessonId": request.lesson_id,
+            }
+        )
+
+    # Batched into create_many by the write-behind queue; explicit timestamps
+    # keep the pair ordered
+    message_write_queue.enqueue_messages(
+        [
+            {
+                "conversationId": conversation_id,
+                "role": "user",
+                "content": request.message,
+                "createdAt": turn["started_at"],
+            },
+            {
+                "conversationId": conversation_id,
+                "role": "assistant",
+                "content": result["response"],
+                "translation": result.get("translation"),
+                "createdAt": datetime.utcnow(),
+            },
+        ]
+    )
+
+    return conversation_id
+
+
+async def _cache_exchange(
+    request: ChatRequest, turn: Dict[str, Any], result: Dict[str, Any]
+):
+    """
+    Append the exchange to the cached conversation (and record the owner of
+    a new one) before the response goes out; the queued database insert
+    lands up to a flush interval later
+    """
+    conversation_id = turn["conversation_id"]
+    try:
+        if turn["is_new_conversation"]:
+            await redis_service.set_conversation_owner(
+                conversation_id, turn["user"].id
+            )
+        await redis_service.append_messages(
+            conversation_id,
+            [
+                {"role": "user", "content": request.message},
+                {
+                    "role": "assistant",
+                    "content": result["response"],
+                    "translation": result.get("translation"),
+                },
+            ],
+        )
+    except Exception as e:
+        print(f"Warning: failed to cache chat exchange: {e}")
+
+
+@router.get("/conversation/{conversation_id}")
+async def get_conversation(
+    conversation_id: str,
+    user_id: str,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    db=Depends(get_db),
+):
+    """
+    Get conversation history (only for the learner who owns it)
+    With limit, returns that many messages ending offset messages before
+    the newest one, so clients can page back through long sessions
+    """
+    try:
+        if limit is not None and (limit < 1 or offset < 0):
+            raise HTTPException(
+                status_code=400, detail="limit must be >= 1 and offset >= 0"
+            )
+
+        (user, _), owner_id = await asyncio.gather(
+            _resolve_user(db, user_id), _conversation_owner(db, conversation_id)
+        )
+        if not user or owner_id != user.id:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+
+        if limit is not None:
+            # Ranged read straight from the cached list
+            cached = await redis_service.get_cached_conversation(
+                conversation_id, start=-(offset + limit), end=-(offset + 1)
+            )
+            if cached:
+                return {"messages": cached}
+
+        messages = await _load_conversation_messages(db, conversation_id)
+
+        if messages is None:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+
+        if limit is not None:
+            end = len(messages) - offset
+            messages = messages[max(end - limit, 0):max(end, 0)]
 
         return {"messages": messages}
 
@@ -4,6 +4,7 @@ from typing import List, Optional, Dict, Any
 from datetime import datetime
 
 from app.core.database import get_db
+from app.services.two_tier_cache import catalog_cache
 from app.services.vocabulary_service import vocabulary_service
 
 router = APIRouter()
@@ -32,6 +33,63 @@ class UpdateCourseProgressRequest(BaseModel):
     user_id: str
 
 
+def _course_fields(course) -> Dict[str, Any]:
+    return {
+        "id": course.id,
+        "title": course.title,
+        "description": course.description,
+        "level": course.level,
+        "order": course.order,
+        "imageUrl": course.imageUrl,
+        "estimatedHours": course.estimatedHours,
+        "isLocked": course.isLocked,
+    }
+
+
+async def _load_courses(db, level: Optional[str]) -> List[Dict[str, Any]]:
+    """Course catalog rows (user-independent, so shared through the cache)"""
+
+    async def load():
+        where_clause = {}
+        if level:
+            where_clause["level"] = level
+        courses = await db.course.find_many(
+            where=where_clause, order={"order": "asc"}
+        )
+        return [_course_fields(course) for course in courses]
+
+    return await catalog_cache.get_or_load(
+        f"catalog:courses:{level or 'all'}", load
+    )
+
+
+async def _load_course(db, course_id: str) -> Optional[Dict[str, Any]]:
+    """Course with its lesson summaries, or None if it does not exist"""
+
+    async def load():
+        course = await db.course.find_unique(
+            where={"id": course_id},
+            include={"lessons": True}
+        )
+        if not course:
+            return None
+        return {
+            **_course_fields(course),
+            "lessons": [
+                {
+                    "id": lesson.id,
+                    "title": lesson.title,
+                    "description": lesson.description,
+                    "order": lesson.order,
+                    "duration": lesson.duration,
+                }
+                for lesson in course.lessons
+            ],
+        }
+
+    return await catalog_cache.get_or_load(f"catalog:course:{course_id}", load)
+
+
 @router.get("/", response_model=List[CourseResponse])
 async def get_courses(
     level: Optional[str] = None,
@@ -40,15 +98,7 @@ async def get_courses(
 ):
     """Get all courses, optionally filtered by level"""
     try:
-        where_clause = {}
-        if level:
-            where_clause["level"] = level
-
-        courses = await db.course.find_many(
-            where=where_clause,
-            order={"order": "asc"},
-            include={"lessons": True}
-        )
+        courses = await _load_courses(db, level)
 
         # If user_id provided, get their progress
         progress_map = {}
@@ -64,16 +114,9 @@ async def get_courses(
 
         return [
             CourseResponse(
-                id=course.id,
-                title=course.title,
-                description=course.description,
-                level=course.level,
-                order=course.order,
-                imageUrl=course.imageUrl,
-                estimatedHours=course.estimatedHours,
-                isLocked=course.isLocked,
-                progress=progress_map.get(course.id, 0),
-                isCompleted=completed_map.get(course.id, False),
+                **course,
+                progress=progress_map.get(course["id"], 0),
+                isCompleted=completed_map.get(course["id"], False),
             )
             for course in courses
         ]
@@ -91,10 +134,7 @@ async def get_course(
 ):
     """Get detailed course information including lessons"""
     try:
-        course = await db.course.find_unique(
-            where={"id": course_id},
-            include={"lessons": True}
-        )
+        course = await _load_course(db, course_id)
 
         if not course:
             raise HTTPException(status_code=404, detail="Course not found")
@@ -121,7 +161,7 @@ async def get_course(
                     is_completed = course_progress.isCompleted
 
                 # Count completed lessons
-                lesson_ids = [lesson.id for lesson in course.lessons]
+                lesson_ids = [lesson["id"] for lesson in course["lessons"]]
                 lesson_progress = await db.lessonprogress.find_many(
                     where={
                         "userId": user.id,
@@ -131,31 +171,11 @@ async def get_course(
                 )
                 completed_lessons = len(lesson_progress)
 
-        # Format lessons
-        lessons = [
-            {
-                "id": lesson.id,
-                "title": lesson.title,
-                "description": lesson.description,
-                "order": lesson.order,
-                "duration": lesson.duration,
-            }
-            for lesson in course.lessons
-        ]
-
         return CourseDetailResponse(
-            id=course.id,
-            title=course.title,
-            description=course.description,
-            level=course.level,
-            order=course.order,
-            imageUrl=course.imageUrl,
-            estimatedHours=course.estimatedHours,
-            isLocked=course.isLocked,
+            **course,
             progress=progress,
             isCompleted=is_completed,
-            lessons=lessons,
-            totalLessons=len(course.lessons),
+            totalLessons=len(course["lessons"]),
             completedLessons=completed_lessons,
         )
 
@@ -1,11 +1,12 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict
 from datetime import datetime
 
 from app.core.database import get_db
 from app.services.openai_service import openai_service
-from app.services.pinecone_service import pinecone_service
+from app.services.two_tier_cache import catalog_cache
+from app.services.vector_store import get_vector_store
 from app.services.vocabulary_service import vocabulary_service
 
 router = APIRouter()
@@ -27,6 +28,51 @@ class LessonDetailResponse(LessonResponse):
     grammar: Optional[Dict] = None
 
 
+def _lesson_fields(lesson) -> Dict[str, Any]:
+    return {
+        "id": lesson.id,
+        "title": lesson.title,
+        "description": lesson.description,
+        "level": lesson.level,
+        "order": lesson.order,
+        "objectives": lesson.objectives,
+    }
+
+
+async def _load_lessons(db, level: Optional[str]) -> List[Dict[str, Any]]:
+    """Lesson catalog rows (user-independent, so shared through the cache)"""
+
+    async def load():
+        where_clause = {}
+        if level:
+            where_clause["level"] = level
+        lessons = await db.lesson.find_many(
+            where=where_clause, order={"order": "asc"}
+        )
+        return [_lesson_fields(lesson) for lesson in lessons]
+
+    return await catalog_cache.get_or_load(
+        f"catalog:lessons:{level or 'all'}", load
+    )
+
+
+async def _load_lesson(db, lesson_id: str) -> Optional[Dict[str, Any]]:
+    """Lesson with its content, or None if it does not exist"""
+
+    async def load():
+        lesson = await db.lesson.find_unique(where={"id": lesson_id})
+        if not lesson:
+            return None
+        return {
+            **_lesson_fields(lesson),
+            "content": lesson.content,
+            "vocabulary": lesson.vocabulary,
+            "grammar": lesson.grammar,
+        }
+
+    return await catalog_cache.get_or_load(f"catalog:lesson:{lesson_id}", load)
+
+
 @router.get("/", response_model=List[LessonResponse])
 async def get_lessons(
     level: Optional[str] = None,
@@ -35,13 +81,7 @@ async def get_lessons(
 ):
     """Get all lessons, optionally filtered by level"""
     try:
-        where_clause = {}
-        if level:
-            where_clause["level"] = level
-
-        lessons = await db.lesson.find_many(
-            where=where_clause, order={"order": "asc"}
-        )
+        lessons = await _load_lessons(db, level)
 
         # If user_id provided, get their progress
         progress_map = {}
@@ -56,15 +96,7 @@ async def get_lessons(
                 }
 
         return [
-            LessonResponse(
-                id=lesson.id,
-                title=lesson.title,
-                description=lesson.description,
-                level=lesson.level,
-                order=lesson.order,
-                objectives=lesson.objectives,
-                progress=progress_map.get(lesson.id, 0),
-            )
+            LessonResponse(**lesson, progress=progress_map.get(lesson["id"], 0))
             for lesson in lessons
         ]
 
@@ -81,7 +113,7 @@ async def get_lesson(
 ):
     """Get detailed lesson information"""
     try:
-        lesson = await db.lesson.find_unique(where={"id": lesson_id})
+        lesson = await _load_lesson(db, lesson_id)
 
         if not lesson:
             raise HTTPException(status_code=404, detail="Lesson not found")
@@ -102,18 +134,7 @@ async def get_lesson(
                 if lesson_progress:
                     progress = lesson_progress.progress
 
-        return LessonDetailResponse(
-            id=lesson.id,
-            title=lesson.title,
-            description=lesson.description,
-            level=lesson.level,
-            order=lesson.order,
-            objectives=lesson.objectives,
-            content=lesson.content,
-            vocabulary=lesson.vocabulary,
-            grammar=lesson.grammar,
-            progress=progress,
-        )
+        return LessonDetailResponse(**lesson, progress=progress)
 
     except HTTPException:
         raise
@@ -344,17 +365,25 @@ async def generate_lesson(
             }
         )
 
-        # Index in Pinecone for RAG
-        await pinecone_service.index_lesson_content(
-            lesson.id,
-            {
-                "title": lesson.title,
-                "description": lesson.description,
-                "vocabulary": lesson.vocabulary,
-                "grammar": lesson.grammar,
-            },
-            openai_service.generate_embedding,
+        # New lesson: drop cached course/lesson catalogs in every worker
+        await catalog_cache.invalidate("catalog:")
+        await openai_service.response_cache.invalidate_lesson(lesson.id)
+
+        # Index in the vector store and this worker's lexical index for RAG
+        # (other workers pick it up on their next refresh), and precompute
+        # the context block lesson-scoped chats use
+        lesson_content = {
+            "title": lesson.title,
+            "description": lesson.description,
+            "vocabulary": lesson.vocabulary,
+            "grammar": lesson.grammar,
+        }
+        await get_vector_store().index_lesson_content(
+            lesson.id, lesson_content, openai_service.generate_embedding
         )
+        await openai_service.lesson_context.store(lesson.id, lesson_content)
+        if openai_service.lexical_index:
+            openai_service.lexical_index.add_lesson(lesson.id, lesson_content)
 
         return {
             "success": True,
@@ -18,14 +18,111 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str
     OPENAI_MODEL: str = "gpt-4-turbo-preview"
     EMBEDDING_MODEL: str = "text-embedding-3-small"
+    EMBEDDING_CACHE_SIZE: int = 5000  # Entries kept in the in-process LRU
+    EMBEDDING_CACHE_TTL: int = 86400 * 30  # Seconds embeddings live in Redis
+    EMBEDDING_BATCH_MAX_SIZE: int = 64  # Inputs per batched embeddings call
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 5  # How long to collect a batch
+    EMBEDDING_MAX_INPUT_TOKENS: int = 8191  # Longer inputs are refused, not batched
+    OPENAI_MAX_CONNECTIONS: int = 100  # Shared HTTP pool for all OpenAI calls
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    OPENAI_KEEPALIVE_EXPIRY: float = 30.0  # Seconds an idle connection is kept
+    OPENAI_TIMEOUT: float = 60.0
+    OPENAI_HTTP2: bool = True  # Needs the h2 package; HTTP/1.1 otherwise
 
-    # Pinecone
-    PINECONE_API_KEY: str
-    PINECONE_ENVIRONMENT: str
-    PINECONE_INDEX_NAME: str
+    # Semantic cache of first-turn tutor answers, per (level, lesson)
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_THRESHOLD: float = 0.95  # Min cosine similarity for a hit
+    RESPONSE_CACHE_TTL: int = 86400  # Seconds
+    RESPONSE_CACHE_MAX_ENTRIES: int = 500  # Per bucket; oldest evicted
+    RESPONSE_CACHE_LOCAL_TTL: int = 30  # Seconds a worker reuses a bucket
+
+    # Precomputed context blocks for lesson-scoped chats
+    LESSON_CONTEXT_TTL: int = 604800  # Seconds; rebuilt from Postgres on a miss
+    LESSON_CONTEXT_LOCAL_TTL: int = 30  # Per-worker tier; bounds staleness after an edit
+    LESSON_CONTEXT_LOCAL_MAX_ENTRIES: int = 500
+
+    # Hybrid retrieval: in-process BM25 index fused with vector results
+    LEXICAL_INDEX_ENABLED: bool = True
+    LEXICAL_INDEX_REFRESH_INTERVAL: int = 300  # Seconds between rebuilds from Postgres
+    RRF_K: int = 60  # Reciprocal-rank fusion constant
+    RETRIEVAL_OVERFETCH: int = 4  # Vector candidates fetched per chunk kept
+    RETRIEVAL_MMR_LAMBDA: float = 0.5  # 1 = pure relevance, lower = more diverse
+
+    # Retrieval gate: turns that skip RAG (greetings, acknowledgements, short
+    # replies mid-conversation)
+    RETRIEVAL_GATE_ENABLED: bool = True
+    # English acknowledgements only: Hebrew words (and "shalom") are lesson
+    # vocabulary a learner may be asking about, so they are never skipped
+    RETRIEVAL_GATE_SKIP_PHRASES: str = (
+        "hi,hello,hey,thanks,thank you,ok,okay,yes,no,sure,great,cool,"
+        "continue,go on,next,more,again,bye"
+    )
+    RETRIEVAL_GATE_SHORT_REPLY_WORDS: int = 3  # Replies this short skip when there is history
+
+    # Prompt token budgets per section
+    PROMPT_SYSTEM_TOKEN_BUDGET: int = 600
+    PROMPT_CONTEXT_TOKEN_BUDGET: int = 800
+    PROMPT_HISTORY_TOKEN_BUDGET: int = 2000
+    PROMPT_USER_TOKEN_BUDGET: int = 500
+
+    # Conversation memory: recent messages kept verbatim, older ones summarized
+    MEMORY_RECENT_MESSAGES: int = 8
+    MEMORY_SUMMARIZE_BATCH: int = 6  # Unsummarized messages before re-summarizing
+    MEMORY_SUMMARY_TTL: int = 86400
+
+    # Write-behind queue for chat persistence
+    WRITE_QUEUE_MAX_BATCH: int = 200  # Pending rows that trigger a flush
+    WRITE_QUEUE_FLUSH_INTERVAL: float = 0.5  # Seconds between timed flushes
+    WRITE_QUEUE_MAX_BACKOFF: float = 30.0  # Longest wait between retries in an outage
+
+    # Vector store used for RAG: "pinecone", "local" or "pgvector"
+    VECTOR_STORE_BACKEND: str = "pinecone"
+    LOCAL_VECTOR_STORE_PATH: str = "data/vector_store"
+    PGVECTOR_EF_SEARCH: int = 200  # HNSW candidates per filtered query (pgvector < 0.8)
+
+    # Pinecone (required when VECTOR_STORE_BACKEND is "pinecone")
+    PINECONE_API_KEY: Optional[str] = None
+    PINECONE_ENVIRONMENT: Optional[str] = None
+    PINECONE_INDEX_NAME: Optional[str] = None
+    PINECONE_MAX_CONCURRENCY: int = 8  # Worker threads for blocking SDK calls
+    PINECONE_TIMEOUT: float = 5.0  # Seconds before an async call gives up
 
     # Redis
-    REDIS_URL: str
+    REDIS_URL: Optional[str] = None
+    # "redis", "memory" (in-process, for tests/benchmarks) or "auto" (Redis,
+    # failing over to memory while it is unreachable)
+    REDIS_BACKEND: str = "auto"
+    REDIS_HEALTH_CHECK_INTERVAL: int = 5  # Seconds between failover probes (auto)
+    MEMORY_BACKEND_MAX_KEYS: int = 100000
+    REDIS_MAX_CONNECTIONS: int = 50  # Pool size shared by the whole worker
+    REDIS_SOCKET_TIMEOUT: float = 5.0
+    REDIS_CONNECTION_HEALTH_CHECK: int = 30  # Ping idle connections after (s)
+    CONVERSATION_CACHE_MAX_MESSAGES: int = 1000  # Newest messages kept per list
+    CACHE_SERIALIZER: str = "orjson"  # "orjson", "msgpack" or "json"
+    CACHE_COMPRESSION: str = "zlib"  # "zstd", "lz4", "zlib" or "none"
+    CACHE_COMPRESSION_MIN_BYTES: int = 1024  # Smaller values are stored as-is
+
+    # Course/lesson catalog cache (process-local tier in front of Redis)
+    CATALOG_CACHE_TTL: int = 3600  # Redis tier, seconds
+    CATALOG_CACHE_STALE_TTL: int = 600  # Served stale while one worker refreshes
+    CATALOG_CACHE_LOCAL_TTL: int = 60  # Per-worker tier, seconds
+    CATALOG_CACHE_LOCAL_MAX_ENTRIES: int = 1000
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidate"
+
+    # Vocabulary practice counters (Redis) and their flush into ReviewSession
+    VOCAB_PRACTICE_TTL: int = 86400 * 30  # 30 days
+    VOCAB_PRACTICE_FLUSH_INTERVAL: int = 60  # Seconds
+    VOCAB_PRACTICE_FLUSH_BATCH: int = 500  # Users per flush round trip
+
+    # Single-flight cache fills
+    SINGLE_FLIGHT_LOCK_TTL_MS: int = 5000  # Cross-worker fill lock lifetime
+    SINGLE_FLIGHT_WAIT_MS: int = 3000  # Max wait for another worker's fill
+    SINGLE_FLIGHT_POLL_MS: int = 50
+
+    # Chat rate limit: "sliding_window" or "token_bucket"
+    RATE_LIMIT_CHAT_LIMIT: int = 100
+    RATE_LIMIT_CHAT_WINDOW: int = 3600
+    RATE_LIMIT_CHAT_MODE: str = "sliding_window"
 
     # Clerk
     CLERK_SECRET_KEY: str
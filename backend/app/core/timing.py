@@ -0,0 +1,45 @@
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Dict, Optional
+
+
+class RequestTimer:
+    """Collects per-request latency marks (in milliseconds) for diagnostics"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.marks: Dict[str, float] = {}
+
+    def elapsed_ms(self) -> float:
+        """Milliseconds since the timer was created"""
+        return round((time.perf_counter() - self.started_at) * 1000, 2)
+
+    def mark(self, name: str, once: bool = False) -> Optional[float]:
+        """Record the time elapsed since the start of the request under name"""
+        if once and name in self.marks:
+            return self.marks[name]
+        self.marks[name] = self.elapsed_ms()
+        return self.marks[name]
+
+    @contextmanager
+    def stage(self, name: str):
+        """Record how long the wrapped block takes under name"""
+        stage_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.marks[name] = round((time.perf_counter() - stage_start) * 1000, 2)
+
+    async def track(self, name: str, awaitable: Awaitable[Any]) -> Any:
+        """Await awaitable and record its duration under name"""
+        with self.stage(name):
+            return await awaitable
+
+    def as_dict(self) -> Dict[str, float]:
+        return dict(self.marks)
+
+    def server_timing(self) -> str:
+        """Format marks as a Server-Timing header value"""
+        return ", ".join(
+            f"{name};dur={duration}" for name, duration in self.marks.items()
+        )
@@ -5,18 +5,52 @@ import os
 from dotenv import load_dotenv
 
 from app.api import chat, lessons, users, courses, vocabulary, tts
+from app.core.config import settings
 from app.core.database import prisma
+from app.services.openai_service import openai_service
+from app.services.write_queue import message_write_queue
+from app.services.rate_limiter import rate_limiter
+from app.services.redis_service import redis_service
+from app.services.two_tier_cache import catalog_cache
+from app.services.single_flight import single_flight
+from app.services.practice_flusher import vocabulary_practice_flusher
+from app.services.vector_store import close_vector_store, get_vector_store
 
 load_dotenv()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup
+    # Startup: every external client is created once per worker here, so
+    # no request pays for a connection handshake
     await prisma.connect()
     print("Connected to database")
+    await redis_service.connect()
+    print(f"Cache backend: {redis_service.backend}")
+    await redis_service.start_health_check()
+    try:
+        vector_store = get_vector_store()
+        if settings.VECTOR_STORE_BACKEND == "pgvector":
+            # Create the table and HNSW index once here, not on a request
+            await vector_store.ensure_schema()
+    except Exception as e:
+        print(f"Warning: vector store not available: {e}")
+    await openai_service.start()
+    await message_write_queue.start()
+    await catalog_cache.start()
+    await vocabulary_practice_flusher.start()
+    if openai_service.lexical_index:
+        await openai_service.lexical_index.start()
     yield
     # Shutdown
+    if openai_service.lexical_index:
+        await openai_service.lexical_index.stop()
+    await vocabulary_practice_flusher.stop()
+    await catalog_cache.stop()
+    await message_write_queue.stop()
+    await openai_service.close()
+    close_vector_store()
+    await redis_service.disconnect()
     await prisma.disconnect()
     print("Disconnected from database")
 
@@ -59,9 +93,37 @@ async def root():
 
 @app.get("/health")
 async def health_check():
+    if redis_service.failed_over:
+        # Still serving, but caches and rate limits are per-worker
+        return {"status": "degraded", "redis": redis_service.stats()}
     return {"status": "healthy"}
 
 
+@app.get("/metrics")
+async def metrics():
+    """Cache and pipeline counters for diagnostics"""
+    return {
+        "redis": redis_service.stats(),
+        "openai_pool": openai_service.pool_stats(),
+        "embedding_cache": openai_service.embedding_cache.stats(),
+        "embedding_batcher": openai_service.embedding_batcher.stats(),
+        "response_cache": openai_service.response_cache.stats(),
+        "lesson_context": openai_service.lesson_context.stats(),
+        "retrieval_gate": openai_service.retrieval_gate.stats(),
+        "lexical_index": (
+            openai_service.lexical_index.stats()
+            if openai_service.lexical_index
+            else None
+        ),
+        "write_queue": message_write_queue.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "cache_codec": redis_service.codec.stats(),
+        "catalog_cache": catalog_cache.stats(),
+        "single_flight": single_flight.stats(),
+        "vocabulary_practice": vocabulary_practice_flusher.stats(),
+    }
+
+
 @app.post("/admin/seed-cafe")
 async def seed_cafe_lesson():
     """Seed the cafe lesson into the database"""
@@ -136,6 +198,22 @@ async def seed_cafe_lesson():
             }
         )
 
+        # Drop cached course/lesson catalogs in every worker, and tutor
+        # answers and context based on the old lesson content
+        await catalog_cache.invalidate("catalog:")
+        await openai_service.response_cache.invalidate_lesson(lesson.id)
+        await openai_service.lesson_context.invalidate(lesson.id)
+        if openai_service.lexical_index:
+            openai_service.lexical_index.add_lesson(
+                lesson.id,
+                {
+                    "title": lesson.title,
+                    "description": lesson.description,
+                    "vocabulary": lesson.vocabulary,
+                    "grammar": lesson.grammar,
+                },
+            )
+
         return {
             "success": True,
             "message": f"Lesson '{lesson.title}' created successfully!",
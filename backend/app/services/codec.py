@@ -0,0 +1,197 @@
+from typing import Any, Dict, Optional
+import json
+import struct
+import time
+import zlib
+
+from app.core.config import settings
+
+# Optional fast serializers / compressors; missing ones fall back to stdlib
+try:
+    import orjson
+except ImportError as e:
+    print(f"Warning: orjson not available, cache values use json: {e}")
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+# Encoded values start with a NUL marker (never the first byte of the JSON or
+# plain text written before this format) followed by a 3-byte header:
+# version, serializer id, compression id
+MAGIC = b"\x00"
+VERSION = 1
+HEADER = struct.Struct("BBB")
+
+SERIALIZERS = {"json": 1, "orjson": 2, "msgpack": 3}
+COMPRESSIONS = {"none": 0, "zlib": 1, "zstd": 2, "lz4": 3}
+
+
+class CacheCodec:
+    """
+    Serializes cached values into a tagged binary format
+    The serializer and compression are chosen by settings, and compression is
+    only applied above CACHE_COMPRESSION_MIN_BYTES; every value records how it
+    was written, so changing settings never breaks existing entries
+    """
+
+    def __init__(
+        self,
+        serializer: str = settings.CACHE_SERIALIZER,
+        compression: str = settings.CACHE_COMPRESSION,
+        compression_min_bytes: int = settings.CACHE_COMPRESSION_MIN_BYTES,
+    ):
+        self.serializer = self._available_serializer(serializer)
+        self.compression = self._available_compression(compression)
+        self.compression_min_bytes = compression_min_bytes
+        self._zstd_compressor = zstandard.ZstdCompressor() if zstandard else None
+        self._zstd_decompressor = zstandard.ZstdDecompressor() if zstandard else None
+
+        self.encoded = 0
+        self.decoded = 0
+        self.legacy_decoded = 0
+        self.compressed = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self.encode_ms = 0.0
+        self.decode_ms = 0.0
+
+    def _available_serializer(self, name: str) -> str:
+        if name not in SERIALIZERS:
+            raise ValueError(f"Unknown cache serializer: {name}")
+        if name == "orjson" and orjson is None:
+            return "json"
+        if name == "msgpack" and msgpack is None:
+            print("Warning: msgpack not available, falling back to JSON")
+            return "orjson" if orjson else "json"
+        return name
+
+    def _available_compression(self, name: str) -> str:
+        if name not in COMPRESSIONS:
+            raise ValueError(f"Unknown cache compression: {name}")
+        if (name == "zstd" and zstandard is None) or (name == "lz4" and lz4_frame is None):
+            print(f"Warning: {name} not available, falling back to zlib")
+            return "zlib"
+        return name
+
+    # Serializers
+    def _serialize(self, value: Any) -> bytes:
+        if self.serializer == "orjson":
+            return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+        if self.serializer == "msgpack":
+            return msgpack.packb(value, use_bin_type=True)
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def _deserialize(self, serializer_id: int, payload: bytes) -> Any:
+        if serializer_id == SERIALIZERS["msgpack"]:
+            if msgpack is None:
+                raise ValueError("Cached value needs msgpack, which is not installed")
+            return msgpack.unpackb(payload, raw=False)
+        if orjson is not None:
+            return orjson.loads(payload)
+        return json.loads(payload)
+
+    # Compressors
+    def _compress(self, payload: bytes) -> bytes:
+        if self.compression == "zstd":
+            return self._zstd_compressor.compress(payload)
+        if self.compression == "lz4":
+            return lz4_frame.compress(payload)
+        return zlib.compress(payload)
+
+    def _decompress(self, compression_id: int, payload: bytes) -> bytes:
+        if compression_id == COMPRESSIONS["none"]:
+            return payload
+        if compression_id == COMPRESSIONS["zlib"]:
+            return zlib.decompress(payload)
+        if compression_id == COMPRESSIONS["zstd"]:
+            if zstandard is None:
+                raise ValueError("Cached value needs zstandard, which is not installed")
+            return self._zstd_decompressor.decompress(payload)
+        if compression_id == COMPRESSIONS["lz4"]:
+            if lz4_frame is None:
+                raise ValueError("Cached value needs lz4, which is not installed")
+            return lz4_frame.decompress(payload)
+        raise ValueError(f"Unknown cache compression id: {compression_id}")
+
+    def encode(self, value: Any) -> bytes:
+        """Serialize (and maybe compress) value into a tagged payload"""
+        started = time.perf_counter()
+        payload = self._serialize(value)
+        raw_size = len(payload)
+
+        compression = "none"
+        if self.compression != "none" and raw_size >= self.compression_min_bytes:
+            compressed = self._compress(payload)
+            # Only keep the compressed form if it actually saves space
+            if len(compressed) < raw_size:
+                payload = compressed
+                compression = self.compression
+                self.compressed += 1
+
+        data = (
+            MAGIC
+            + HEADER.pack(VERSION, SERIALIZERS[self.serializer], COMPRESSIONS[compression])
+            + payload
+        )
+
+        self.encoded += 1
+        self.raw_bytes += raw_size
+        self.stored_bytes += len(data)
+        self.encode_ms += (time.perf_counter() - started) * 1000
+        return data
+
+    def decode(self, data: Optional[bytes]) -> Optional[Any]:
+        """Decode a tagged payload, or a legacy JSON / plain text value"""
+        if not data:
+            return None
+
+        started = time.perf_counter()
+        try:
+            if data[:1] != MAGIC:
+                self.legacy_decoded += 1
+                return self._decode_legacy(data)
+
+            version, serializer_id, compression_id = HEADER.unpack_from(data, 1)
+            if version != VERSION:
+                raise ValueError(f"Unsupported cache value version: {version}")
+            payload = self._decompress(compression_id, data[1 + HEADER.size:])
+            return self._deserialize(serializer_id, payload)
+        finally:
+            self.decoded += 1
+            self.decode_ms += (time.perf_counter() - started) * 1000
+
+    def _decode_legacy(self, data: bytes) -> Any:
+        try:
+            return json.loads(data)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return data.decode("utf-8", errors="replace")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "serializer": self.serializer,
+            "compression": self.compression,
+            "encoded": self.encoded,
+            "decoded": self.decoded,
+            "legacy_decoded": self.legacy_decoded,
+            "compressed": self.compressed,
+            "raw_bytes": self.raw_bytes,
+            "stored_bytes": self.stored_bytes,
+            "compression_ratio": (
+                round(self.stored_bytes / self.raw_bytes, 3) if self.raw_bytes else None
+            ),
+            "avg_encode_ms": round(self.encode_ms / self.encoded, 4) if self.encoded else 0.0,
+            "avg_decode_ms": round(self.decode_ms / self.decoded, 4) if self.decoded else 0.0,
+        }
@@ -0,0 +1,142 @@
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+
+from prisma import Json
+
+from app.core.config import settings
+from app.core.database import prisma
+from app.services.redis_service import RedisService
+from app.services.single_flight import single_flight
+
+Summarizer = Callable[[Optional[str], List[Dict[str, str]]], Awaitable[str]]
+
+
+class ConversationMemory:
+    """
+    Bounded conversation memory for long tutoring sessions
+    The newest messages are kept verbatim; older ones are folded into a
+    running summary that is regenerated in the background and stored in Redis
+    (conversation:{id}:summary) and as a system Message in Postgres
+    """
+
+    def __init__(
+        self,
+        redis_service: RedisService,
+        summarize: Summarizer,
+        recent_messages: int = settings.MEMORY_RECENT_MESSAGES,
+        summarize_batch: int = settings.MEMORY_SUMMARIZE_BATCH,
+        summary_ttl: int = settings.MEMORY_SUMMARY_TTL,
+    ):
+        self.redis = redis_service
+        self.summarize = summarize
+        self.recent_messages = recent_messages
+        self.summarize_batch = summarize_batch
+        self.summary_ttl = summary_ttl
+        self._in_flight: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _key(self, conversation_id: str) -> str:
+        return f"conversation:{conversation_id}:summary"
+
+    async def get_summary(self, conversation_id: str) -> Optional[Dict]:
+        """
+        Return {"summary", "summarized_count"} from Redis, else Postgres
+        A conversation without a summary is cached too (summary None), so
+        resumed turns do not query Postgres until one is written
+        """
+        key = self._key(conversation_id)
+        cached = await self.redis.get(key)
+        if cached:
+            return cached
+
+        async def load():
+            message = await prisma.message.find_first(
+                where={"conversationId": conversation_id, "role": "system"},
+                order={"createdAt": "desc"},
+            )
+            if message and isinstance(message.metadata, dict):
+                summary = {
+                    "summary": message.content,
+                    "summarized_count": message.metadata.get("summarized_count", 0),
+                }
+            else:
+                summary = {"summary": None, "summarized_count": 0}
+            await self.redis.set(key, summary, self.summary_ttl)
+            return summary
+
+        return await single_flight.fill(key, load, lambda: self.redis.get(key))
+
+    async def prepare(
+        self, conversation_id: Optional[str], history: List[Dict[str, str]]
+    ) -> Tuple[Optional[str], List[Dict[str, str]]]:
+        """
+        Split history into (summary, messages to send verbatim)
+        Messages already folded into the summary are dropped
+        """
+        if not conversation_id:
+            return None, history
+
+        stored = await self.get_summary(conversation_id)
+        if not stored or stored["summary"] is None:
+            return None, history
+
+        summarized_count = min(stored["summarized_count"], len(history))
+        return stored["summary"], history[summarized_count:]
+
+    def schedule_update(
+        self, conversation_id: str, history: List[Dict[str, str]]
+    ):
+        """Regenerate the summary in the background once enough turns pile up"""
+        if conversation_id in self._in_flight:
+            return
+        if len(history) < self.recent_messages + self.summarize_batch:
+            return
+
+        self._in_flight.add(conversation_id)
+        task = asyncio.create_task(self._update(conversation_id, list(history)))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _update(self, conversation_id: str, history: List[Dict[str, str]]):
+        try:
+            stored = await self.get_summary(conversation_id) or {
+                "summary": None,
+                "summarized_count": 0,
+            }
+            summarized_count = stored["summarized_count"]
+            cutoff = len(history) - self.recent_messages
+            if cutoff - summarized_count < self.summarize_batch:
+                return
+
+            summary = await self.summarize(
+                stored["summary"], history[summarized_count:cutoff]
+            )
+            updated = {"summary": summary, "summarized_count": cutoff}
+            await self.redis.set(self._key(conversation_id), updated, self.summary_ttl)
+            await self._store_in_database(conversation_id, updated)
+        except Exception as e:
+            print(f"Error updating conversation summary: {e}")
+        finally:
+            self._in_flight.discard(conversation_id)
+
+    async def _store_in_database(self, conversation_id: str, stored: Dict):
+        metadata = Json(
+            {"kind": "summary", "summarized_count": stored["summarized_count"]}
+        )
+        existing = await prisma.message.find_first(
+            where={"conversationId": conversation_id, "role": "system"}
+        )
+        if existing:
+            await prisma.message.update(
+                where={"id": existing.id},
+                data={"content": stored["summary"], "metadata": metadata},
+            )
+        else:
+            await prisma.message.create(
+                data={
+                    "conversationId": conversation_id,
+                    "role": "system",
+                    "content": stored["summary"],
+                    "metadata": metadata,
+                }
+            )
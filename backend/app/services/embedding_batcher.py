@@ -0,0 +1,122 @@
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple, Type
+import asyncio
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent single-text embedding requests into batched API calls
+    Requests are collected for up to max_wait_ms (or until max_batch_size
+    inputs are pending), sent as one call, and the results fanned back out
+    A batch rejected with one of split_on (request validation errors) is
+    retried input by input so only the offending caller fails; any other
+    error, such as a rate limit or timeout, fails the whole batch
+    """
+
+    def __init__(
+        self,
+        embed_many: Callable[[List[str]], Awaitable[List[List[float]]]],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5,
+        count_tokens: Optional[Callable[[str], int]] = None,
+        max_input_tokens: Optional[int] = None,
+        split_on: Tuple[Type[Exception], ...] = (),
+    ):
+        self.embed_many = embed_many
+        self.count_tokens = count_tokens
+        self.max_input_tokens = max_input_tokens
+        self.split_on = split_on
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.inputs = 0
+        self.largest_batch = 0
+        self.failed_batches = 0
+        self.failed_inputs = 0
+
+    async def embed(self, text: str) -> List[float]:
+        """Queue text for the next batch and wait for its embedding"""
+        # Inputs the API would reject are refused here, so they cannot fail
+        # the other callers' batch
+        if not text or not text.strip():
+            raise ValueError("Cannot embed empty text")
+        if (
+            self.count_tokens is not None
+            and self.max_input_tokens is not None
+            and self.count_tokens(text) > self.max_input_tokens
+        ):
+            raise ValueError(
+                f"Text exceeds the embedding limit of {self.max_input_tokens} tokens"
+            )
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]):
+        # Identical texts in one window only need to be embedded once
+        unique_texts = list(dict.fromkeys(text for text, _ in batch))
+        self.batches += 1
+        self.inputs += len(unique_texts)
+        self.largest_batch = max(self.largest_batch, len(unique_texts))
+
+        try:
+            by_text = dict(zip(unique_texts, await self.embed_many(unique_texts)))
+        except Exception as e:
+            self.failed_batches += 1
+            if len(unique_texts) == 1 or not isinstance(e, self.split_on):
+                # Splitting a rate-limited batch would only multiply requests
+                by_text = {text: e for text in unique_texts}
+            else:
+                # Retry each input on its own so only the offending caller fails
+                results = await asyncio.gather(
+                    *(self.embed_many([text]) for text in unique_texts),
+                    return_exceptions=True,
+                )
+                by_text = {
+                    text: result if isinstance(result, Exception) else result[0]
+                    for text, result in zip(unique_texts, results)
+                }
+
+        for text, future in batch:
+            if future.done():
+                continue
+            result = by_text[text]
+            if isinstance(result, Exception):
+                self.failed_inputs += 1
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "inputs": self.inputs,
+            "largest_batch": self.largest_batch,
+            "avg_batch_size": round(self.inputs / self.batches, 2) if self.batches else 0.0,
+            "pending": len(self._pending),
+            "failed_batches": self.failed_batches,
+            "failed_inputs": self.failed_inputs,
+        }
@@ -0,0 +1,94 @@
+from collections import OrderedDict
+from typing import List, Optional, Dict
+import hashlib
+import re
+import unicodedata
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.redis_service import RedisService
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache keyed by (model, normalized text hash)
+    Tier 1 is an in-process LRU, tier 2 is Redis; vectors are stored as
+    float32 bytes rather than JSON lists
+    """
+
+    def __init__(
+        self,
+        redis_service: RedisService,
+        max_entries: int = settings.EMBEDDING_CACHE_SIZE,
+        ttl: int = settings.EMBEDDING_CACHE_TTL,
+    ):
+        self.redis = redis_service
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normalize text so trivially different inputs share a cache entry"""
+        text = unicodedata.normalize("NFC", text)
+        return re.sub(r"\s+", " ", text).strip()
+
+    def key(self, model: str, text: str) -> str:
+        digest = hashlib.sha256(self.normalize(text).encode("utf-8")).hexdigest()
+        return f"embedding:{model}:{digest}"
+
+    async def get(self, model: str, text: str) -> Optional[List[float]]:
+        """Look up an embedding in the local tier, then Redis"""
+        key = self.key(model, text)
+
+        vector = self._local.get(key)
+        if vector is not None:
+            self._local.move_to_end(key)
+            self.local_hits += 1
+            return vector.tolist()
+
+        try:
+            payload = await self.redis.get_bytes(key)
+        except Exception as e:
+            print(f"Warning: embedding cache lookup failed: {e}")
+            payload = None
+
+        if payload:
+            vector = np.frombuffer(payload, dtype=np.float32)
+            self._remember(key, vector)
+            self.shared_hits += 1
+            return vector.tolist()
+
+        self.misses += 1
+        return None
+
+    async def set(self, model: str, text: str, embedding: List[float]):
+        """Store an embedding in both tiers"""
+        key = self.key(model, text)
+        vector = np.asarray(embedding, dtype=np.float32)
+        self._remember(key, vector)
+
+        try:
+            await self.redis.set_bytes(key, vector.tobytes(), expiry=self.ttl)
+        except Exception as e:
+            print(f"Warning: embedding cache write failed: {e}")
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._local[key] = vector
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.local_hits + self.shared_hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_ratio": round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+            "local_entries": len(self._local),
+        }
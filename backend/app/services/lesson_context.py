@@ -0,0 +1,137 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import time
+
+from app.core.config import settings
+from app.core.database import prisma
+from app.services.prompt_builder import PromptBuilder
+from app.services.redis_service import RedisService
+from app.services.single_flight import single_flight
+from app.services.vector_store import build_lesson_chunks
+
+# Order chunks appear in a lesson's context block: the overview first so it
+# survives truncation, then vocabulary and grammar in lesson order
+CHUNK_PRIORITY = {"title": 0, "description": 1, "vocabulary": 2, "grammar": 3}
+
+
+def format_chunk(metadata: Dict[str, Any]) -> str:
+    """Render one retrieved chunk the way the tutor prompt expects it"""
+    return f"[{metadata.get('type', 'content')}] {metadata.get('text', '')}"
+
+
+class LessonContextCache:
+    """
+    Precomputed RAG context for lesson-scoped chats
+    A lesson has only a handful of chunks, so instead of embedding each
+    question and searching the vector store, the whole lesson is rendered
+    once into a ranked block fitted to the context token budget. Blocks are
+    built at index time, kept in Redis (lesson_context:{id}) and a local LRU,
+    and rebuilt lazily from Postgres on a miss. invalidate() only reaches this
+    worker and Redis, so local entries expire after a short TTL
+    """
+
+    def __init__(
+        self,
+        redis_service: RedisService,
+        prompt_builder: PromptBuilder,
+        max_tokens: int = settings.PROMPT_CONTEXT_TOKEN_BUDGET,
+        ttl: int = settings.LESSON_CONTEXT_TTL,
+        local_ttl: int = settings.LESSON_CONTEXT_LOCAL_TTL,
+        local_max_entries: int = settings.LESSON_CONTEXT_LOCAL_MAX_ENTRIES,
+    ):
+        self.redis = redis_service
+        self.prompt_builder = prompt_builder
+        self.max_tokens = max_tokens
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.local_max_entries = local_max_entries
+        self._local: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.builds = 0
+        self.missing = 0
+
+    def _key(self, lesson_id: str) -> str:
+        return f"lesson_context:{lesson_id}"
+
+    def _remember(self, lesson_id: str, block: str):
+        self._local[lesson_id] = (time.monotonic() + self.local_ttl, block)
+        self._local.move_to_end(lesson_id)
+        while len(self._local) > self.local_max_entries:
+            self._local.popitem(last=False)
+
+    def build_block(self, lesson_id: str, content: Dict) -> str:
+        """Render lesson content into a ranked, token-bounded context block"""
+        chunks: List[Dict[str, Any]] = build_lesson_chunks(lesson_id, content)
+        chunks.sort(key=lambda c: CHUNK_PRIORITY.get(c["metadata"]["type"], 99))
+        return self.prompt_builder.pack_chunks(
+            [format_chunk(c["metadata"]) for c in chunks], self.max_tokens
+        )
+
+    async def store(self, lesson_id: str, content: Dict) -> str:
+        """Build and cache the block for a lesson (called when it is indexed)"""
+        block = self.build_block(lesson_id, content)
+        self.builds += 1
+        self._remember(lesson_id, block)
+        try:
+            await self.redis.set(self._key(lesson_id), block, self.ttl)
+        except Exception as e:
+            print(f"Warning: lesson context write failed: {e}")
+        return block
+
+    async def get(self, lesson_id: str) -> Optional[str]:
+        """The lesson's context block, or None if the lesson does not exist"""
+        entry = self._local.get(lesson_id)
+        if entry is not None:
+            expires_at, block = entry
+            if expires_at >= time.monotonic():
+                self._local.move_to_end(lesson_id)
+                self.local_hits += 1
+                return block
+            del self._local[lesson_id]
+
+        key = self._key(lesson_id)
+        try:
+            block = await self.redis.get(key)
+        except Exception as e:
+            print(f"Warning: lesson context lookup failed: {e}")
+            block = None
+        if block is not None:
+            self.redis_hits += 1
+            self._remember(lesson_id, block)
+            return block
+
+        async def load():
+            lesson = await prisma.lesson.find_unique(where={"id": lesson_id})
+            if not lesson:
+                self.missing += 1
+                return None
+            return await self.store(
+                lesson_id,
+                {
+                    "title": lesson.title,
+                    "description": lesson.description,
+                    "vocabulary": lesson.vocabulary,
+                    "grammar": lesson.grammar,
+                },
+            )
+
+        return await single_flight.fill(key, load, lambda: self.redis.get(key))
+
+    async def invalidate(self, lesson_id: str):
+        """Forget a lesson's block; the next chat rebuilds it"""
+        self._local.pop(lesson_id, None)
+        try:
+            await self.redis.delete(self._key(lesson_id))
+        except Exception as e:
+            print(f"Warning: lesson context invalidation failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "builds": self.builds,
+            "missing_lessons": self.missing,
+            "local_entries": len(self._local),
+        }
@@ -0,0 +1,243 @@
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+import asyncio
+import math
+import re
+import time
+import unicodedata
+
+from app.core.config import settings
+from app.core.database import prisma
+from app.services.vector_store import build_lesson_chunks
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Final letter forms folded into their regular forms
+FINAL_LETTERS = str.maketrans({"ך": "כ", "ם": "מ", "ן": "נ", "ף": "פ", "ץ": "צ"})
+
+# Vocabulary metadata fields a learner may type verbatim
+EXACT_FIELDS = ("hebrew", "transliteration", "english")
+
+
+def normalize_hebrew(text: str) -> str:
+    """Lowercase, strip niqqud/cantillation and punctuation, fold final letters"""
+    text = unicodedata.normalize("NFD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = text.translate(FINAL_LETTERS)
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def tokenize(text: str) -> List[str]:
+    return normalize_hebrew(text).split()
+
+
+def reciprocal_rank_fusion(
+    result_lists: List[List[Dict[str, Any]]], k: int = settings.RRF_K
+) -> List[Dict[str, Any]]:
+    """
+    Merge ranked match lists by summing 1 / (k + rank) per id
+    Matches keep the first metadata seen; score becomes the fused score
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    for matches in result_lists:
+        for rank, match in enumerate(matches, start=1):
+            entry = fused.setdefault(
+                match["id"],
+                {"id": match["id"], "score": 0.0, "metadata": match.get("metadata", {})},
+            )
+            entry["score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda m: m["score"], reverse=True)
+
+
+class LexicalIndex:
+    """
+    In-process BM25 index over the lesson chunks indexed for RAG
+    Catches what embeddings miss on short Hebrew strings: tokens are
+    niqqud-free with final letters folded, and vocabulary chunks also carry
+    their transliteration and English. A query that is exactly a vocabulary
+    entry is answered from here without an embedding. Each worker rebuilds
+    the index from Postgres at startup and every refresh_interval seconds
+    """
+
+    def __init__(
+        self,
+        db=prisma,
+        refresh_interval: int = settings.LEXICAL_INDEX_REFRESH_INTERVAL,
+    ):
+        self.db = db
+        self.refresh_interval = refresh_interval
+        self._task: Optional[asyncio.Task] = None
+        self._reset()
+
+        self.searches = 0
+        self.exact_hits = 0
+        self.builds = 0
+        self.last_build_ms = 0.0
+
+    def _reset(self):
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_lengths: Dict[str, int] = {}
+        self._metadata: Dict[str, Dict[str, Any]] = {}
+        # Doc id -> (terms, exact keys), to unindex it
+        self._doc_keys: Dict[str, Tuple[List[str], Set[str]]] = {}
+        self._lesson_docs: Dict[str, Set[str]] = {}
+        # Normalized vocabulary entry -> chunk ids
+        self._exact: Dict[str, Set[str]] = {}
+        self._total_length = 0
+
+    async def start(self):
+        """Build the index in the background and keep it refreshed"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.rebuild()
+            except Exception as e:
+                print(f"Warning: lexical index rebuild failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    async def rebuild(self):
+        """Re-index every lesson from the database"""
+        started = time.perf_counter()
+        lessons = await self.db.lesson.find_many()
+
+        fresh = LexicalIndex(self.db, self.refresh_interval)
+        for lesson in lessons:
+            fresh.add_lesson(
+                lesson.id,
+                {
+                    "title": lesson.title,
+                    "description": lesson.description,
+                    "vocabulary": lesson.vocabulary,
+                    "grammar": lesson.grammar,
+                },
+            )
+
+        # Swap everything in at once so searches never see a half-built index
+        self._postings = fresh._postings
+        self._doc_lengths = fresh._doc_lengths
+        self._metadata = fresh._metadata
+        self._doc_keys = fresh._doc_keys
+        self._lesson_docs = fresh._lesson_docs
+        self._exact = fresh._exact
+        self._total_length = fresh._total_length
+        self.builds += 1
+        self.last_build_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def add_lesson(self, lesson_id: str, content: Dict):
+        """Index (or re-index) a lesson's chunks"""
+        self.remove_lesson(lesson_id)
+        for chunk in build_lesson_chunks(lesson_id, content):
+            self._add_chunk(lesson_id, chunk)
+
+    def _add_chunk(self, lesson_id: str, chunk: Dict[str, Any]):
+        doc_id = chunk["id"]
+        metadata = chunk["metadata"]
+        terms = Counter(tokenize(f"{chunk['text']} {metadata.get('transliteration', '')}"))
+        for term, count in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = count
+
+        exact_keys = set()
+        if metadata.get("type") == "vocabulary":
+            exact_keys = {normalize_hebrew(metadata.get(f) or "") for f in EXACT_FIELDS}
+            exact_keys.discard("")
+            for key in exact_keys:
+                self._exact.setdefault(key, set()).add(doc_id)
+
+        length = sum(terms.values())
+        self._doc_lengths[doc_id] = length
+        self._total_length += length
+        self._metadata[doc_id] = metadata
+        self._doc_keys[doc_id] = (list(terms), exact_keys)
+        self._lesson_docs.setdefault(lesson_id, set()).add(doc_id)
+
+    def remove_lesson(self, lesson_id: str):
+        for doc_id in self._lesson_docs.pop(lesson_id, set()):
+            terms, exact_keys = self._doc_keys.pop(doc_id)
+            for term in terms:
+                postings = self._postings[term]
+                del postings[doc_id]
+                if not postings:
+                    del self._postings[term]
+            for key in exact_keys:
+                docs = self._exact[key]
+                docs.discard(doc_id)
+                if not docs:
+                    del self._exact[key]
+            self._total_length -= self._doc_lengths.pop(doc_id)
+            del self._metadata[doc_id]
+
+    def _in_lesson(self, doc_ids, lesson_id: Optional[str]) -> List[str]:
+        return [
+            d for d in doc_ids
+            if lesson_id is None or self._metadata[d].get("lesson_id") == lesson_id
+        ]
+
+    def has_exact_match(self, query: str, lesson_id: Optional[str] = None) -> bool:
+        """Whether the query is exactly a vocabulary entry (cheap; no counting)"""
+        return bool(self._in_lesson(self._exact.get(normalize_hebrew(query), ()), lesson_id))
+
+    def exact_matches(
+        self, query: str, lesson_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Vocabulary chunks whose Hebrew, transliteration or English is the query"""
+        doc_ids = self._in_lesson(self._exact.get(normalize_hebrew(query), ()), lesson_id)
+        if doc_ids:
+            self.exact_hits += 1
+        return [
+            {"id": d, "score": 1.0, "metadata": self._metadata[d]}
+            for d in sorted(doc_ids)
+        ]
+
+    def search(
+        self, query: str, top_k: int = 5, lesson_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """BM25-ranked matches in the vector store's {"id", "score", "metadata"} shape"""
+        self.searches += 1
+        doc_count = len(self._doc_lengths)
+        if not doc_count:
+            return []
+        avg_length = self._total_length / doc_count
+
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            for doc_id in self._in_lesson(postings, lesson_id):
+                tf = postings[doc_id]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [
+            {"id": doc_id, "score": score, "metadata": self._metadata[doc_id]}
+            for doc_id, score in ranked
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "documents": len(self._doc_lengths),
+            "terms": len(self._postings),
+            "lessons": len(self._lesson_docs),
+            "searches": self.searches,
+            "exact_hits": self.exact_hits,
+            "builds": self.builds,
+            "last_build_ms": self.last_build_ms,
+        }
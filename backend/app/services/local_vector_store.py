@@ -0,0 +1,326 @@
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Optional, Any, Tuple
+import asyncio
+import json
+import os
+import threading
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes are only serialized within a process
+    fcntl = None
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.vector_store import VectorStore
+
+
+def matches_filter(metadata: Dict[str, Any], filter: Optional[Dict]) -> bool:
+    """Evaluate a Pinecone-style metadata filter ($eq/$ne/$in/$nin, implicit AND)"""
+    if not filter:
+        return True
+
+    for field, condition in filter.items():
+        value = metadata.get(field)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, expected in condition.items():
+            if operator == "$eq" and value != expected:
+                return False
+            if operator == "$ne" and value == expected:
+                return False
+            if operator == "$in" and value not in expected:
+                return False
+            if operator == "$nin" and value in expected:
+                return False
+    return True
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector index for the (small) lesson corpus
+    Rows are L2-normalized float32 embeddings in a .npy file that every worker
+    memory-maps read-only; ids/metadata live in a JSON sidecar. Queries are
+    exact cosine top-k, so no external service is needed.
+    Writes run in a thread (they may wait on another worker's file lock and
+    rewrite the whole matrix); queries read one immutable snapshot
+    """
+
+    def __init__(
+        self,
+        path: str = settings.LOCAL_VECTOR_STORE_PATH,
+        dimension: int = 1536,
+    ):
+        self.directory = Path(path)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.directory / "index.json"
+        self.lock_path = self.directory / "index.lock"
+        self.dimension = dimension
+        self._write_lock = threading.Lock()
+        self._loaded_version: Optional[tuple] = None
+        # (matrix, ids, metadata, namespaces), replaced as a whole so a query
+        # never sees rows from two different versions
+        self._snapshot: Tuple[np.ndarray, List[str], List[Dict[str, Any]], List[str]] = (
+            np.zeros((0, dimension), dtype=np.float32),
+            [],
+            [],
+            [],
+        )
+        self._refresh()
+
+    @contextmanager
+    def _locked(self):
+        """
+        Serialize read-modify-write across threads and across the workers
+        sharing the directory (otherwise the last os.replace wins)
+        """
+        with self._write_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self, attempts: int = 3):
+        """Reload the index if another worker (or this one) rewrote it"""
+        for _ in range(attempts):
+            try:
+                stat = self.index_path.stat()
+            except FileNotFoundError:
+                return
+            # os.replace gives every rewrite a new inode
+            version = (stat.st_ino, stat.st_mtime_ns)
+            if version == self._loaded_version:
+                return
+
+            try:
+                with open(self.index_path, encoding="utf-8") as f:
+                    index = json.load(f)
+                if index["ids"]:
+                    matrix = np.load(
+                        self.directory / index["vectors_file"], mmap_mode="r"
+                    )
+                else:
+                    matrix = np.zeros((0, self.dimension), dtype=np.float32)
+            except FileNotFoundError:
+                # Another worker replaced the index and removed the vectors
+                # file between our two reads; read the new index
+                continue
+
+            self._snapshot = (
+                matrix, index["ids"], index["metadata"], index["namespaces"]
+            )
+            self._loaded_version = version
+            return
+
+        print("Warning: local vector index changed while loading, keeping previous snapshot")
+
+    def _write(
+        self,
+        matrix: np.ndarray,
+        ids: List[str],
+        metadata: List[Dict[str, Any]],
+        namespaces: List[str],
+    ):
+        """Atomically replace the on-disk index"""
+        old_vectors = None
+        if self.index_path.exists():
+            with open(self.index_path, encoding="utf-8") as f:
+                old_vectors = json.load(f).get("vectors_file")
+
+        # Each write gets a fresh vectors file so readers holding the old
+        # memory map are never exposed to a half-written matrix
+        vectors_file = f"vectors-{uuid.uuid4().hex}.npy"
+        np.save(self.directory / vectors_file, matrix.astype(np.float32))
+
+        tmp_path = self.index_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "vectors_file": vectors_file,
+                    "ids": ids,
+                    "metadata": metadata,
+                    "namespaces": namespaces,
+                },
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(tmp_path, self.index_path)
+
+        if old_vectors and old_vectors != vectors_file:
+            try:
+                (self.directory / old_vectors).unlink()
+            except OSError:
+                pass
+
+        self._refresh()
+
+    def upsert_vectors(
+        self, vectors: List[Dict[str, Any]], namespace: str = ""
+    ) -> Dict:
+        """Insert or replace vectors by (namespace, id)"""
+        with self._locked():
+            self._refresh()
+            matrix, ids, metadata, namespaces = self._snapshot
+            positions = {
+                (ns, vector_id): i
+                for i, (ns, vector_id) in enumerate(zip(namespaces, ids))
+            }
+            matrix = np.array(matrix, dtype=np.float32)
+            ids = list(ids)
+            metadata = list(metadata)
+            namespaces = list(namespaces)
+
+            new_rows = []
+            for vector in vectors:
+                row = np.asarray(vector["values"], dtype=np.float32)
+                norm = np.linalg.norm(row)
+                if norm:
+                    row = row / norm
+
+                position = positions.get((namespace, vector["id"]))
+                if position is not None:
+                    matrix[position] = row
+                    metadata[position] = vector.get("metadata", {})
+                else:
+                    positions[(namespace, vector["id"])] = len(ids)
+                    ids.append(vector["id"])
+                    metadata.append(vector.get("metadata", {}))
+                    namespaces.append(namespace)
+                    new_rows.append(row)
+
+            if new_rows:
+                matrix = np.vstack([matrix.reshape(-1, self.dimension), np.stack(new_rows)])
+
+            self._write(matrix, ids, metadata, namespaces)
+            return {"upserted_count": len(vectors)}
+
+    def query(
+        self,
+        query_vector: List[float],
+        top_k: int = 5,
+        filter: Optional[Dict] = None,
+        namespace: str = "",
+        include_metadata: bool = True,
+        include_values: bool = False,
+    ) -> Dict:
+        """Exact cosine top-k over the rows matching namespace and filter"""
+        self._refresh()
+        matrix, ids, metadatas, namespaces = self._snapshot
+
+        candidates = np.array(
+            [
+                i
+                for i, (ns, metadata) in enumerate(zip(namespaces, metadatas))
+                if ns == namespace and matches_filter(metadata, filter)
+            ],
+            dtype=np.int64,
+        )
+        if candidates.size == 0 or top_k <= 0:
+            return {"matches": []}
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        if candidates.size == len(ids):
+            scores = matrix @ query
+        else:
+            scores = matrix[candidates] @ query
+
+        k = min(top_k, candidates.size)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+
+        matches = []
+        for position in best:
+            row = int(candidates[position])
+            match = {"id": ids[row], "score": float(scores[position])}
+            if include_metadata:
+                match["metadata"] = metadatas[row]
+            if include_values:
+                match["values"] = matrix[row].tolist()
+            matches.append(match)
+        return {"matches": matches}
+
+    def delete(
+        self,
+        ids: Optional[List[str]] = None,
+        delete_all: bool = False,
+        namespace: str = "",
+        filter: Optional[Dict] = None,
+    ):
+        """Delete vectors by id, by metadata filter, or the whole namespace"""
+        if not (delete_all or ids or filter):
+            return
+
+        with self._locked():
+            self._refresh()
+            matrix, stored_ids, metadatas, namespaces = self._snapshot
+            id_set = set(ids or [])
+            keep = [
+                i
+                for i, (ns, vector_id, metadata) in enumerate(
+                    zip(namespaces, stored_ids, metadatas)
+                )
+                if ns != namespace
+                or not (
+                    delete_all
+                    or vector_id in id_set
+                    or (filter and matches_filter(metadata, filter))
+                )
+            ]
+            matrix = np.array(matrix, dtype=np.float32).reshape(-1, self.dimension)
+            self._write(
+                matrix[keep],
+                [stored_ids[i] for i in keep],
+                [metadatas[i] for i in keep],
+                [namespaces[i] for i in keep],
+            )
+
+    async def upsert_vectors_async(
+        self, vectors: List[Dict[str, Any]], namespace: str = ""
+    ) -> Dict:
+        return await asyncio.to_thread(self.upsert_vectors, vectors, namespace)
+
+    async def query_async(
+        self,
+        query_vector: List[float],
+        top_k: int = 5,
+        filter: Optional[Dict] = None,
+        namespace: str = "",
+        include_metadata: bool = True,
+        include_values: bool = False,
+    ) -> Dict:
+        # Sub-millisecond for this corpus size, so no executor hop is needed
+        return self.query(
+            query_vector,
+            top_k=top_k,
+            filter=filter,
+            namespace=namespace,
+            include_metadata=include_metadata,
+            include_values=include_values,
+        )
+
+    async def delete_async(
+        self,
+        ids: Optional[List[str]] = None,
+        delete_all: bool = False,
+        namespace: str = "",
+        filter: Optional[Dict] = None,
+    ):
+        return await asyncio.to_thread(
+            self.delete,
+            ids=ids,
+            delete_all=delete_all,
+            namespace=namespace,
+            filter=filter,
+        )
@@ -0,0 +1,402 @@
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+import asyncio
+import fnmatch
+import time
+
+from redis.exceptions import ResponseError
+
+WRONGTYPE = "WRONGTYPE Operation against a key holding the wrong kind of value"
+
+
+def _index_range(length: int, start: int, end: int) -> slice:
+    """Redis LRANGE/ZRANGE start/end (inclusive, negatives from the end) as a slice"""
+    start = max(start + length if start < 0 else start, 0)
+    end = end + length if end < 0 else end
+    # An end before the first element, or before start, selects nothing
+    if end < 0 or end < start:
+        return slice(0, 0)
+    return slice(start, end + 1)
+
+
+def _bytes(value: Any) -> bytes:
+    """Encode a value the way redis-py does before sending it"""
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    if isinstance(value, (int, float)):
+        return repr(value).encode()
+    raise TypeError(f"Invalid input of type {type(value).__name__}")
+
+
+def _key(key: Any) -> str:
+    return key.decode("utf-8") if isinstance(key, bytes) else key
+
+
+class InMemoryRedis:
+    """
+    In-process stand-in for the redis.asyncio client (decode_responses=False)
+    Implements the strings, lists, hashes, sets and sorted sets commands this
+    app uses, with TTLs, pipelines and same-process pub/sub. Commands never
+    yield to the event loop, so each one (and each pipeline) is atomic.
+    Keys are evicted least-recently-used above max_keys.
+    """
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._data: "OrderedDict[str, Tuple[str, Any]]" = OrderedDict()
+        self._expires: Dict[str, float] = {}
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    # Keyspace helpers
+    def _expired(self, key: str) -> bool:
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._data.pop(key, None)
+            del self._expires[key]
+            return True
+        return False
+
+    def _lookup(self, key: Any, kind: str) -> Optional[Any]:
+        key = _key(key)
+        if key not in self._data or self._expired(key):
+            return None
+        stored_kind, value = self._data[key]
+        if stored_kind != kind:
+            raise ResponseError(WRONGTYPE)
+        self._data.move_to_end(key)
+        return value
+
+    def _store(self, key: Any, kind: str, value: Any, keep_ttl: bool = False):
+        key = _key(key)
+        if not keep_ttl:
+            self._expires.pop(key, None)
+        self._data[key] = (kind, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_keys:
+            evicted, _ = self._data.popitem(last=False)
+            self._expires.pop(evicted, None)
+
+    def _container(self, key: Any, kind: str, factory) -> Any:
+        value = self._lookup(key, kind)
+        if value is None:
+            value = factory()
+            self._store(key, kind, value)
+        return value
+
+    def _drop_if_empty(self, key: Any, value: Any):
+        if not value:
+            self._delete(key)
+
+    def _delete(self, key: Any) -> int:
+        key = _key(key)
+        self._expires.pop(key, None)
+        return 0 if self._data.pop(key, None) is None else 1
+
+    def _ttl_ms(self, ex: Optional[int], px: Optional[int]) -> Optional[float]:
+        if ex is not None:
+            return ex * 1000
+        return px
+
+    # Generic
+    def _cmd_delete(self, *keys) -> int:
+        # Expired keys are dropped by _expired() and do not count as deleted
+        return sum(self._delete(key) for key in keys if not self._expired(_key(key)))
+
+    def _cmd_exists(self, *keys) -> int:
+        return sum(
+            1 for key in keys
+            if _key(key) in self._data and not self._expired(_key(key))
+        )
+
+    def _cmd_pexpire(self, key, ms: int) -> bool:
+        key = _key(key)
+        if key not in self._data or self._expired(key):
+            return False
+        self._expires[key] = time.monotonic() + ms / 1000
+        return True
+
+    def _cmd_expire(self, key, seconds: int) -> bool:
+        return self._cmd_pexpire(key, seconds * 1000)
+
+    def _cmd_ping(self) -> bool:
+        return True
+
+    # Strings
+    def _cmd_get(self, key) -> Optional[bytes]:
+        return self._lookup(key, "string")
+
+    def _cmd_set(self, key, value, ex=None, px=None, nx=False, xx=False) -> Optional[bool]:
+        exists = self._cmd_exists(key) > 0
+        if (nx and exists) or (xx and not exists):
+            return None
+        self._store(key, "string", _bytes(value))
+        ttl_ms = self._ttl_ms(ex, px)
+        if ttl_ms is not None:
+            self._cmd_pexpire(key, ttl_ms)
+        return True
+
+    def _cmd_setex(self, key, seconds: int, value) -> bool:
+        return self._cmd_set(key, value, ex=seconds)
+
+    def _cmd_mget(self, keys, *args) -> List[Optional[bytes]]:
+        keys = [keys, *args] if isinstance(keys, (str, bytes)) else list(keys)
+        return [self._cmd_get(key) for key in keys]
+
+    def _cmd_mset(self, mapping: Dict[Any, Any]) -> bool:
+        for key, value in mapping.items():
+            self._cmd_set(key, value)
+        return True
+
+    def _cmd_incrby(self, key, amount: int = 1) -> int:
+        current = self._lookup(key, "string")
+        try:
+            value = int(current or 0) + amount
+        except ValueError:
+            raise ResponseError("value is not an integer or out of range")
+        self._store(key, "string", _bytes(value), keep_ttl=True)
+        return value
+
+    def _cmd_incr(self, key, amount: int = 1) -> int:
+        return self._cmd_incrby(key, amount)
+
+    # Lists
+    def _cmd_rpush(self, key, *values) -> int:
+        items = self._container(key, "list", list)
+        items.extend(_bytes(v) for v in values)
+        return len(items)
+
+    def _cmd_lrange(self, key, start: int, end: int) -> List[bytes]:
+        items = self._lookup(key, "list") or []
+        return items[_index_range(len(items), start, end)]
+
+    def _cmd_ltrim(self, key, start: int, end: int) -> bool:
+        items = self._lookup(key, "list")
+        if items is not None:
+            items[:] = self._cmd_lrange(key, start, end)
+            self._drop_if_empty(key, items)
+        return True
+
+    def _cmd_llen(self, key) -> int:
+        return len(self._lookup(key, "list") or [])
+
+    # Hashes
+    def _cmd_hset(self, key, field=None, value=None, mapping=None) -> int:
+        fields = self._container(key, "hash", dict)
+        updates = dict(mapping or {})
+        if field is not None:
+            updates[field] = value
+        added = 0
+        for f, v in updates.items():
+            f = _bytes(f)
+            added += f not in fields
+            fields[f] = _bytes(v)
+        return added
+
+    def _cmd_hsetnx(self, key, field, value) -> bool:
+        fields = self._container(key, "hash", dict)
+        field = _bytes(field)
+        if field in fields:
+            return False
+        fields[field] = _bytes(value)
+        return True
+
+    def _cmd_hget(self, key, field) -> Optional[bytes]:
+        return (self._lookup(key, "hash") or {}).get(_bytes(field))
+
+    def _cmd_hmget(self, key, keys, *args) -> List[Optional[bytes]]:
+        fields = self._lookup(key, "hash") or {}
+        names = [keys, *args] if isinstance(keys, (str, bytes)) else list(keys)
+        return [fields.get(_bytes(name)) for name in names]
+
+    def _cmd_hgetall(self, key) -> Dict[bytes, bytes]:
+        return dict(self._lookup(key, "hash") or {})
+
+    def _cmd_hincrby(self, key, field, amount: int = 1) -> int:
+        fields = self._container(key, "hash", dict)
+        field = _bytes(field)
+        value = int(fields.get(field, b"0")) + amount
+        fields[field] = _bytes(value)
+        return value
+
+    def _cmd_hdel(self, key, *names) -> int:
+        fields = self._lookup(key, "hash")
+        if fields is None:
+            return 0
+        removed = sum(fields.pop(_bytes(name), None) is not None for name in names)
+        self._drop_if_empty(key, fields)
+        return removed
+
+    # Sets
+    def _cmd_sadd(self, key, *values) -> int:
+        members = self._container(key, "set", set)
+        before = len(members)
+        members.update(_bytes(v) for v in values)
+        return len(members) - before
+
+    def _cmd_srem(self, key, *values) -> int:
+        members = self._lookup(key, "set")
+        if members is None:
+            return 0
+        before = len(members)
+        members.difference_update(_bytes(v) for v in values)
+        self._drop_if_empty(key, members)
+        return before - len(members)
+
+    def _cmd_smembers(self, key) -> Set[bytes]:
+        return set(self._lookup(key, "set") or ())
+
+    def _cmd_spop(self, key, count: Optional[int] = None):
+        members = self._lookup(key, "set")
+        if not members:
+            return None if count is None else []
+        popped = [members.pop() for _ in range(min(count or 1, len(members)))]
+        self._drop_if_empty(key, members)
+        return popped[0] if count is None else popped
+
+    # Sorted sets
+    def _cmd_zadd(self, key, mapping: Dict[Any, float]) -> int:
+        scores = self._container(key, "zset", dict)
+        added = 0
+        for member, score in mapping.items():
+            member = _bytes(member)
+            added += member not in scores
+            scores[member] = float(score)
+        return added
+
+    def _cmd_zrem(self, key, *members) -> int:
+        scores = self._lookup(key, "zset")
+        if scores is None:
+            return 0
+        removed = sum(scores.pop(_bytes(m), None) is not None for m in members)
+        self._drop_if_empty(key, scores)
+        return removed
+
+    def _cmd_zcard(self, key) -> int:
+        return len(self._lookup(key, "zset") or {})
+
+    def _cmd_zscore(self, key, member) -> Optional[float]:
+        return (self._lookup(key, "zset") or {}).get(_bytes(member))
+
+    def _cmd_zremrangebyscore(self, key, min_score, max_score) -> int:
+        scores = self._lookup(key, "zset")
+        if scores is None:
+            return 0
+        doomed = [m for m, s in scores.items() if float(min_score) <= s <= float(max_score)]
+        for member in doomed:
+            del scores[member]
+        self._drop_if_empty(key, scores)
+        return len(doomed)
+
+    def _cmd_zrange(self, key, start: int, end: int, withscores: bool = False):
+        scores = self._lookup(key, "zset") or {}
+        ranked = sorted(scores.items(), key=lambda item: (item[1], item[0]))
+        ranked = ranked[_index_range(len(ranked), start, end)]
+        if withscores:
+            return [(member, score) for member, score in ranked]
+        return [member for member, _ in ranked]
+
+    # Pub/sub
+    def _cmd_publish(self, channel, message) -> int:
+        queues = self._subscribers.get(_key(channel), set())
+        for queue in queues:
+            queue.put_nowait(
+                {"type": "message", "channel": _bytes(channel), "data": _bytes(message)}
+            )
+        return len(queues)
+
+    def pubsub(self) -> "InMemoryPubSub":
+        return InMemoryPubSub(self)
+
+    async def scan_iter(self, match: Optional[str] = None, count: int = 0) -> AsyncIterator[bytes]:
+        for key in list(self._data):
+            if self._expired(key):
+                continue
+            if match is None or fnmatch.fnmatchcase(key, match):
+                yield key.encode("utf-8")
+
+    def pipeline(self, transaction: bool = True) -> "InMemoryPipeline":
+        return InMemoryPipeline(self)
+
+    async def close(self):
+        pass
+
+    def __getattr__(self, name: str):
+        command = getattr(type(self), f"_cmd_{name}", None)
+        if command is None:
+            raise AttributeError(name)
+
+        async def call(*args, **kwargs):
+            return command(self, *args, **kwargs)
+
+        return call
+
+
+class InMemoryPipeline:
+    """Queues commands and runs them back to back on execute()"""
+
+    def __init__(self, client: InMemoryRedis):
+        self.client = client
+        self._commands: List[Tuple[str, tuple, dict]] = []
+
+    def __getattr__(self, name: str):
+        if not hasattr(InMemoryRedis, f"_cmd_{name}"):
+            raise AttributeError(name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((name, args, kwargs))
+            return self
+
+        return queue
+
+    async def execute(self) -> List[Any]:
+        commands, self._commands = self._commands, []
+        return [
+            getattr(self.client, f"_cmd_{name}")(*args, **kwargs)
+            for name, args, kwargs in commands
+        ]
+
+    async def __aenter__(self) -> "InMemoryPipeline":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._commands = []
+
+
+class InMemoryPubSub:
+    """Subscription to channels published on the same InMemoryRedis"""
+
+    def __init__(self, client: InMemoryRedis):
+        self.client = client
+        self.channels: Set[str] = set()
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    async def subscribe(self, *channels):
+        for channel in channels:
+            channel = _key(channel)
+            self.channels.add(channel)
+            self.client._subscribers.setdefault(channel, set()).add(self.queue)
+            self.queue.put_nowait(
+                {"type": "subscribe", "channel": _bytes(channel), "data": len(self.channels)}
+            )
+
+    async def listen(self) -> AsyncIterator[Dict[str, Any]]:
+        while self.channels:
+            yield await self.queue.get()
+
+    async def get_message(
+        self, ignore_subscribe_messages: bool = False, timeout: Optional[float] = 0.0
+    ) -> Optional[Dict[str, Any]]:
+        try:
+            message = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if ignore_subscribe_messages and message["type"] != "message":
+            return None
+        return message
+
+    async def close(self):
+        for channel in self.channels:
+            self.client._subscribers.get(channel, set()).discard(self.queue)
+        self.channels = set()
@@ -0,0 +1,49 @@
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app.core.config import settings
+
+
+def mmr_select(
+    query_vector: List[float],
+    matches: List[Dict[str, Any]],
+    k: int,
+    lambda_mult: float = settings.RETRIEVAL_MMR_LAMBDA,
+) -> List[Dict[str, Any]]:
+    """
+    Pick k matches by maximal marginal relevance
+    Each step takes the candidate that best trades similarity to the query
+    (weight lambda_mult) against similarity to what is already picked, so
+    near-duplicate chunks do not crowd out the rest. Matches need "values";
+    without them the first k are returned as ranked
+    """
+    if len(matches) <= k or any(not m.get("values") for m in matches):
+        return matches[:k]
+
+    vectors = np.asarray([m["values"] for m in matches], dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1, norms)
+    query = np.asarray(query_vector, dtype=np.float32)
+    query_norm = np.linalg.norm(query)
+    if query_norm:
+        query = query / query_norm
+
+    relevance = vectors @ query
+    similarity = vectors @ vectors.T
+
+    selected = [int(np.argmax(relevance))]
+    # Highest similarity of each candidate to anything selected so far
+    redundancy = similarity[selected[0]].copy()
+    available = np.ones(len(matches), dtype=bool)
+    available[selected[0]] = False
+
+    while len(selected) < k:
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+
+    return [matches[i] for i in selected]
@@ -1,53 +1,242 @@
-from openai import AsyncOpenAI
-from typing import List, Dict, Optional
+from openai import AsyncOpenAI, BadRequestError
+from typing import List, Dict, Optional, AsyncIterator, Any
+import asyncio
 import json
 
+import httpx
+
 from app.core.config import settings
-from app.services.pinecone_service import PineconeService
-from app.services.redis_service import RedisService
+from app.core.timing import RequestTimer
+from app.services.vector_store import VectorStore, get_vector_store
+from app.services.redis_service import redis_service
+from app.services.embedding_cache import EmbeddingCache
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.prompt_builder import PromptBuilder
+from app.services.conversation_memory import ConversationMemory
+from app.services.response_cache import ResponseCache
+from app.services.lesson_context import LessonContextCache, format_chunk
+from app.services.retrieval_gate import RetrievalDecision, RetrievalGate
+from app.services.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from app.services.mmr import mmr_select
+
+
+def _http2_available() -> bool:
+    if not settings.OPENAI_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        print("Warning: h2 not installed, OpenAI client falls back to HTTP/1.1")
+        return False
+    return True
+
+
+def _build_http_client(http2: bool) -> httpx.AsyncClient:
+    """One keep-alive connection pool shared by every OpenAI call in the worker"""
+    return httpx.AsyncClient(
+        http2=http2,
+        timeout=httpx.Timeout(settings.OPENAI_TIMEOUT, connect=10.0),
+        limits=httpx.Limits(
+            max_connections=settings.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY,
+        ),
+    )
 
 
 class OpenAIService:
     def __init__(self):
+        self.http2 = _http2_available()
+        # Created by start() inside the event loop, not at import time
+        self.http_client: Optional[httpx.AsyncClient] = None
+        self.client: Optional[AsyncOpenAI] = None
+        self.redis = redis_service
+        self.model = settings.OPENAI_MODEL
+        self.embedding_model = settings.EMBEDDING_MODEL
+        self.prompt_builder = PromptBuilder(self.model)
+        self.embedding_cache = EmbeddingCache(self.redis)
+        self.embedding_batcher = EmbeddingBatcher(
+            self._embed_batch,
+            max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS,
+            count_tokens=self.prompt_builder.count,
+            max_input_tokens=settings.EMBEDDING_MAX_INPUT_TOKENS,
+            split_on=(BadRequestError,),
+        )
+        self.memory = ConversationMemory(self.redis, self.summarize_conversation)
+        self.response_cache = ResponseCache(self.redis)
+        self.lesson_context = LessonContextCache(self.redis, self.prompt_builder)
+        self.lexical_index = LexicalIndex() if settings.LEXICAL_INDEX_ENABLED else None
+        self.retrieval_gate = RetrievalGate()
+
+    @property
+    def vector_store(self) -> VectorStore:
+        # Created at startup by the lifespan, not at import time
+        return get_vector_store()
+
+    async def start(self):
+        """Open the shared HTTP connection pool and the OpenAI client"""
+        if self.http_client is not None:
+            return
+        self.http_client = _build_http_client(self.http2)
         try:
-            self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+            self.client = AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY, http_client=self.http_client
+            )
         except Exception as e:
             print(f"Warning: Failed to initialize OpenAI client: {e}")
             self.client = None
-        self.pinecone = PineconeService()
-        self.redis = RedisService()
-        self.model = settings.OPENAI_MODEL
-        self.embedding_model = settings.EMBEDDING_MODEL
+
+    async def close(self):
+        """Close the shared HTTP connection pool"""
+        if self.http_client is not None:
+            await self.http_client.aclose()
+        self.http_client = None
+        self.client = None
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Connection usage of the shared OpenAI HTTP pool"""
+        pool = getattr(getattr(self.http_client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        return {
+            "max_connections": settings.OPENAI_MAX_CONNECTIONS,
+            "open": len(connections),
+            "idle": sum(1 for c in connections if c.is_idle()),
+            "http2": self.http2,
+        }
 
     async def generate_embedding(self, text: str) -> List[float]:
-        """Generate embedding for text using OpenAI"""
+        """Generate embedding for text using OpenAI (cached by content)"""
+        cached = await self.embedding_cache.get(self.embedding_model, text)
+        if cached is not None:
+            return cached
+
+        # Concurrent callers are coalesced into one batched API call
+        embedding = await self.embedding_batcher.embed(text)
+        await self.embedding_cache.set(self.embedding_model, text, embedding)
+        return embedding
+
+    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed several texts with a single OpenAI call, preserving order"""
         response = await self.client.embeddings.create(
-            model=self.embedding_model, input=text
+            model=self.embedding_model, input=texts
         )
-        return response.data[0].embedding
+        ordered = sorted(response.data, key=lambda item: item.index)
+        return [item.embedding for item in ordered]
 
     async def get_relevant_context(
-        self, query: str, lesson_id: Optional[str] = None, top_k: int = 5
+        self,
+        query: str,
+        lesson_id: Optional[str] = None,
+        top_k: int = 5,
+        query_embedding: Optional[List[float]] = None,
     ) -> str:
-        """Retrieve relevant context from Pinecone using RAG"""
-        # Generate embedding for the query
-        query_embedding = await self.generate_embedding(query)
-
-        # Search Pinecone for relevant content
+        """
+        Retrieve relevant context using RAG
+        Lesson-scoped queries use the lesson's precomputed context block and
+        need no embedding. Otherwise a query that is exactly a vocabulary
+        entry is answered from the lexical index, and anything else is a
+        vector search fused with lexical (BM25) results
+        """
+        if lesson_id:
+            try:
+                block = await self.lesson_context.get(lesson_id)
+            except Exception as e:
+                print(f"Warning: lesson context unavailable, using vector search: {e}")
+                block = None
+            if block is not None:
+                return block
+
+        if not query.strip():
+            return ""
+
+        if self.lexical_index:
+            exact = self.lexical_index.exact_matches(query, lesson_id)
+            if exact:
+                return self._pack_matches(exact)
+
+        # Generate embedding for the query unless the caller already has it
+        if query_embedding is None:
+            query_embedding = await self.generate_embedding(query)
+
+        # Over-fetch from the vector store, then keep a diverse top_k so
+        # near-duplicate vocabulary lines do not fill the context
         filter_dict = {"lesson_id": lesson_id} if lesson_id else None
-        results = self.pinecone.query(
-            query_embedding, top_k=top_k, filter=filter_dict
+        try:
+            results = await self.vector_store.query_async(
+                query_embedding,
+                top_k=top_k * settings.RETRIEVAL_OVERFETCH,
+                filter=filter_dict,
+                include_values=True,
+            )
+            matches = mmr_select(query_embedding, results.get("matches", []), top_k)
+        except asyncio.TimeoutError:
+            # Answer with lexical context only rather than holding up the chat
+            print("Warning: vector store query timed out, continuing without it")
+            matches = []
+
+        if self.lexical_index:
+            lexical = self.lexical_index.search(query, top_k, lesson_id)
+            matches = reciprocal_rank_fusion([matches, lexical])[:top_k]
+
+        return self._pack_matches(matches)
+
+    def _pack_matches(self, matches: List[Dict[str, Any]]) -> str:
+        """Format matches, best first, as whole chunks within the context budget"""
+        return self.prompt_builder.pack_chunks(
+            [format_chunk(match.get("metadata", {})) for match in matches]
         )
 
-        # Format context from results
-        context_pieces = []
-        for match in results.get("matches", []):
-            metadata = match.get("metadata", {})
-            context_pieces.append(
-                f"[{metadata.get('type', 'content')}] {metadata.get('text', '')}"
+    def answers_lexically(self, query: str) -> bool:
+        """Whether get_relevant_context can answer query without an embedding"""
+        return bool(self.lexical_index and self.lexical_index.has_exact_match(query))
+
+    def decide_retrieval(
+        self,
+        user_message: str,
+        conversation_history: List[Dict[str, str]],
+        conversation_id: Optional[str],
+        lesson_id: Optional[str],
+    ) -> RetrievalDecision:
+        """Ask the retrieval gate whether this turn needs RAG context"""
+        has_history = bool(conversation_history or conversation_id)
+        return self.retrieval_gate.decide(user_message, has_history, lesson_id)
+
+    async def _retrieve(
+        self,
+        user_message: str,
+        lesson_id: Optional[str],
+        query_embedding: Optional[List[float]],
+        retrieval: RetrievalDecision,
+        timer: RequestTimer,
+    ) -> str:
+        """Context for the prompt, or none when the gate skipped retrieval"""
+        if not retrieval.retrieve:
+            return ""
+        context = await timer.track(
+            "retrieval",
+            self.get_relevant_context(
+                user_message, lesson_id, query_embedding=query_embedding
+            ),
+        )
+        # Vector search also pays for the query embedding
+        if not lesson_id:
+            self.retrieval_gate.record_search(
+                timer.marks["retrieval"] + timer.marks.get("embedding", 0.0)
             )
+        return context
 
-        return "\n\n".join(context_pieces)
+    def _build_chat_messages(
+        self, messages: List[Dict[str, str]], system_prompt: Optional[str]
+    ) -> List[Dict[str, str]]:
+        """Prepend the system prompt (if any) to the conversation messages"""
+        chat_messages = []
+
+        if system_prompt:
+            chat_messages.append({"role": "system", "content": system_prompt})
+
+        chat_messages.extend(messages)
+        return chat_messages
 
     async def chat_completion(
         self,
@@ -57,13 +246,7 @@ class OpenAIService:
         max_tokens: int = 1000,
     ) -> Dict[str, str]:
         """Generate chat completion with OpenAI"""
-        # Build messages array
-        chat_messages = []
-
-        if system_prompt:
-            chat_messages.append({"role": "system", "content": system_prompt})
-
-        chat_messages.extend(messages)
+        chat_messages = self._build_chat_messages(messages, system_prompt)
 
         # Call OpenAI
         response = await self.client.chat.completions.create(
@@ -83,19 +266,53 @@ class OpenAIService:
             },
         }
 
-    async def hebrew_tutor_response(
+    async def chat_completion_stream(
         self,
-        user_message: str,
-        conversation_history: List[Dict[str, str]],
-        user_level: str = "A1",
-        lesson_id: Optional[str] = None,
-    ) -> Dict[str, str]:
-        """Generate Hebrew tutor response with RAG context"""
-        # Get relevant context from RAG
-        context = await self.get_relevant_context(user_message, lesson_id)
+        messages: List[Dict[str, str]],
+        system_prompt: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a chat completion from OpenAI
+        Yields {"type": "token", "content": ...} for every content delta and a
+        final {"type": "done", "response": ..., "model": ...} event
+        """
+        chat_messages = self._build_chat_messages(messages, system_prompt)
+
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=chat_messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+        )
+
+        model = self.model
+        pieces = []
+        async for chunk in stream:
+            model = chunk.model or model
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                pieces.append(delta)
+                yield {"type": "token", "content": delta}
+
+        yield {"type": "done", "response": "".join(pieces), "model": model}
+
+    def _build_tutor_system_prompt(
+        self, user_level: str, context: str, summary: Optional[str] = None
+    ) -> str:
+        """Build the system prompt for the Hebrew tutor"""
+        summary_section = ""
+        if summary:
+            summary_section = f"""
 
-        # Build system prompt for Hebrew tutor
-        system_prompt = f"""You are an expert Hebrew language tutor. The student is currently at {user_level} level.
+Summary of the earlier conversation:
+{summary}"""
+
+        return f"""You are an expert Hebrew language tutor. The student is currently at {user_level} level.
 
 Your role is to:
 1. Teach Hebrew in an engaging, patient, and encouraging way
@@ -106,7 +323,7 @@ Your role is to:
 6. Keep responses concise and focused
 
 Relevant lesson context:
-{context}
+{context}{summary_section}
 
 Guidelines:
 - For beginners (A1): Use simple vocabulary, focus on basics, provide lots of support
@@ -118,20 +335,26 @@ Guidelines:
 
 Format your responses in Hebrew first, then provide an English translation if needed."""
 
-        # Add user message to history
-        messages = conversation_history + [
-            {"role": "user", "content": user_message}
-        ]
-
-        # Get completion
-        result = await self.chat_completion(
-            messages=messages,
-            system_prompt=system_prompt,
-            temperature=0.7,
+    def _build_tutor_prompt(
+        self,
+        user_message: str,
+        conversation_history: List[Dict[str, str]],
+        user_level: str,
+        context: str,
+        summary: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Assemble the tutor prompt within the configured token budgets"""
+        return self.prompt_builder.build(
+            system_prompt=lambda ctx: self._build_tutor_system_prompt(
+                user_level, ctx, summary
+            ),
+            context=context,
+            history=conversation_history,
+            user_message=user_message,
         )
 
-        # Try to extract translation if present
-        response_text = result["response"]
+    def _split_translation(self, response_text: str) -> tuple[str, Optional[str]]:
+        """Split a tutor response into its Hebrew part and English translation"""
         translation = None
 
         # Simple heuristic: if response contains both Hebrew and Latin characters
@@ -143,13 +366,213 @@ Format your responses in Hebrew first, then provide an English translation if ne
                 response_text = parts[0]
                 translation = parts[1]
 
-        return {
+        return response_text, translation
+
+    def uses_response_cache(
+        self,
+        user_message: str,
+        conversation_history: List[Dict[str, str]],
+        conversation_id: Optional[str],
+    ) -> bool:
+        """Only non-empty turns without history may use the semantic response cache"""
+        return (
+            settings.RESPONSE_CACHE_ENABLED
+            and bool(user_message.strip())
+            and not conversation_history
+            and conversation_id is None
+        )
+
+    async def hebrew_tutor_response(
+        self,
+        user_message: str,
+        conversation_history: List[Dict[str, str]],
+        user_level: str = "A1",
+        lesson_id: Optional[str] = None,
+        query_embedding: Optional[List[float]] = None,
+        timer: Optional[RequestTimer] = None,
+        conversation_id: Optional[str] = None,
+        retrieval: Optional[RetrievalDecision] = None,
+    ) -> Dict[str, str]:
+        """Generate Hebrew tutor response with RAG context"""
+        timer = timer or RequestTimer()
+        if retrieval is None:
+            retrieval = self.decide_retrieval(
+                user_message, conversation_history, conversation_id, lesson_id
+            )
+
+        # First turns carry nothing personal, so similar questions can share
+        # an answer
+        cacheable = self.uses_response_cache(
+            user_message, conversation_history, conversation_id
+        )
+        if cacheable:
+            if query_embedding is None:
+                query_embedding = await self.generate_embedding(user_message)
+            cached = await timer.track(
+                "response_cache",
+                self.response_cache.lookup(user_level, lesson_id, query_embedding),
+            )
+            if cached:
+                return {
+                    **cached,
+                    "usage": None,
+                    "prompt_tokens": None,
+                    "cached": True,
+                    "retrieval": retrieval.reason,
+                }
+
+        # Get relevant context from RAG and the conversation summary
+        context, (summary, recent_history) = await asyncio.gather(
+            self._retrieve(
+                user_message, lesson_id, query_embedding, retrieval, timer
+            ),
+            timer.track(
+                "memory", self.memory.prepare(conversation_id, conversation_history)
+            ),
+        )
+
+        # Build system prompt and messages within the token budgets
+        prompt = self._build_tutor_prompt(
+            user_message, recent_history, user_level, context, summary
+        )
+
+        # Get completion
+        result = await timer.track(
+            "completion",
+            self.chat_completion(
+                messages=prompt["messages"],
+                system_prompt=prompt["system_prompt"],
+                temperature=0.7,
+            ),
+        )
+
+        # Try to extract translation if present
+        response_text, translation = self._split_translation(result["response"])
+
+        answer = {
             "response": response_text,
             "translation": translation,
             "model": result["model"],
+        }
+        if cacheable:
+            await self.response_cache.store(
+                user_level, lesson_id, query_embedding, answer
+            )
+
+        return {
+            **answer,
             "usage": result["usage"],
+            "prompt_tokens": prompt["token_counts"],
+            "retrieval": retrieval.reason,
         }
 
+    async def hebrew_tutor_response_stream(
+        self,
+        user_message: str,
+        conversation_history: List[Dict[str, str]],
+        user_level: str = "A1",
+        lesson_id: Optional[str] = None,
+        query_embedding: Optional[List[float]] = None,
+        timer: Optional[RequestTimer] = None,
+        conversation_id: Optional[str] = None,
+        retrieval: Optional[RetrievalDecision] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream Hebrew tutor response with RAG context
+        Yields token events as they arrive, then a final "done" event carrying
+        the full response and extracted translation
+        """
+        timer = timer or RequestTimer()
+        if retrieval is None:
+            retrieval = self.decide_retrieval(
+                user_message, conversation_history, conversation_id, lesson_id
+            )
+
+        cacheable = self.uses_response_cache(
+            user_message, conversation_history, conversation_id
+        )
+        if cacheable:
+            if query_embedding is None:
+                query_embedding = await self.generate_embedding(user_message)
+            cached = await timer.track(
+                "response_cache",
+                self.response_cache.lookup(user_level, lesson_id, query_embedding),
+            )
+            if cached:
+                # The full answer is already known: send it as one token
+                yield {"type": "token", "content": cached["response"]}
+                yield {
+                    "type": "done",
+                    **cached,
+                    "prompt_tokens": None,
+                    "cached": True,
+                    "retrieval": retrieval.reason,
+                }
+                return
+
+        context, (summary, recent_history) = await asyncio.gather(
+            self._retrieve(
+                user_message, lesson_id, query_embedding, retrieval, timer
+            ),
+            timer.track(
+                "memory", self.memory.prepare(conversation_id, conversation_history)
+            ),
+        )
+        prompt = self._build_tutor_prompt(
+            user_message, recent_history, user_level, context, summary
+        )
+
+        async for event in self.chat_completion_stream(
+            messages=prompt["messages"],
+            system_prompt=prompt["system_prompt"],
+            temperature=0.7,
+        ):
+            if event["type"] != "done":
+                yield event
+                continue
+
+            response_text, translation = self._split_translation(event["response"])
+            answer = {
+                "response": response_text,
+                "translation": translation,
+                "model": event["model"],
+            }
+            if cacheable:
+                await self.response_cache.store(
+                    user_level, lesson_id, query_embedding, answer
+                )
+            yield {
+                "type": "done",
+                **answer,
+                "prompt_tokens": prompt["token_counts"],
+                "retrieval": retrieval.reason,
+            }
+
+    async def summarize_conversation(
+        self,
+        previous_summary: Optional[str],
+        messages: List[Dict[str, str]],
+    ) -> str:
+        """Fold older conversation turns into a running summary"""
+        system_prompt = """You maintain a running summary of a Hebrew tutoring session. Keep it under 150 words. Record the topics covered, vocabulary practiced, mistakes the student made and anything the student said about themselves."""
+
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        user_prompt = f"""Current summary:
+{previous_summary or "(none yet)"}
+
+New messages:
+{transcript}
+
+Write the updated summary."""
+
+        result = await self.chat_completion(
+            messages=[{"role": "user", "content": user_prompt}],
+            system_prompt=system_prompt,
+            temperature=0.3,
+            max_tokens=300,
+        )
+        return result["response"]
+
     async def generate_lesson_content(
         self, level: str, topic: str, objectives: List[str]
     ) -> Dict:
@@ -0,0 +1,239 @@
+from typing import List, Dict, Optional, Any
+import asyncio
+import json
+
+from app.core.config import settings
+from app.core.database import prisma
+from app.services.vector_store import VectorStore
+
+# Metadata fields that map onto real columns; anything else is read from the
+# JSON metadata column
+_FILTER_COLUMNS = {
+    "id": 'e."id"',
+    "lesson_id": 'e."lessonId"',
+    "type": 'e."type"',
+    "level": 'l."level"',
+}
+
+
+# Transaction-scoped advisory lock key serializing the DDL across workers
+# (concurrent CREATE ... IF NOT EXISTS can still fail on the catalog)
+SCHEMA_LOCK_KEY = 0x4C45535345  # "LESSE"
+
+# Run in order by ensure_schema; all idempotent
+SCHEMA_STATEMENTS = (
+    "CREATE EXTENSION IF NOT EXISTS vector",
+    "CREATE SCHEMA IF NOT EXISTS rag",
+    'CREATE TABLE IF NOT EXISTS rag."LessonEmbedding" ('
+    '"id" TEXT NOT NULL, '
+    '"namespace" TEXT NOT NULL DEFAULT \'\', '
+    '"lessonId" TEXT NOT NULL REFERENCES "Lesson"("id") ON DELETE CASCADE, '
+    '"type" TEXT NOT NULL, '
+    '"text" TEXT NOT NULL, '
+    '"metadata" JSONB, '
+    '"embedding" vector(1536) NOT NULL, '
+    '"updatedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP, '
+    'PRIMARY KEY ("namespace", "id"))',
+    'CREATE INDEX IF NOT EXISTS "LessonEmbedding_lessonId_idx" '
+    'ON rag."LessonEmbedding" ("lessonId")',
+    'CREATE INDEX IF NOT EXISTS "LessonEmbedding_embedding_hnsw_idx" '
+    'ON rag."LessonEmbedding" USING hnsw ("embedding" vector_cosine_ops)',
+)
+
+
+def _vector_literal(values: List[float]) -> str:
+    return "[" + ",".join(f"{float(v):.7g}" for v in values) + "]"
+
+
+class PgVectorStore(VectorStore):
+    """
+    Vector store backed by a LessonEmbedding table in our own Postgres
+    Uses the pgvector extension with an HNSW cosine index, and joins Lesson so
+    lesson/level filters are applied in SQL. The table lives in its own "rag"
+    schema, outside what Prisma manages, so databases without pgvector can
+    still push the Prisma schema; it is created by ensure_schema() at startup
+    (and on first use, if startup could not reach the database)
+    """
+
+    def __init__(self, db=prisma):
+        self.db = db
+        self._index_ready = False
+        self._index_lock: Optional[asyncio.Lock] = None
+        # hnsw.iterative_scan needs pgvector 0.8+
+        self._iterative_scan = False
+
+    async def ensure_schema(self):
+        """Create the extension, table and indexes if they do not exist yet"""
+        if self._index_ready:
+            return
+        if self._index_lock is None:
+            self._index_lock = asyncio.Lock()
+
+        async with self._index_lock:
+            if self._index_ready:
+                return
+            if not self.db.is_connected():
+                await self.db.connect()
+            async with self.db.tx() as tx:
+                await tx.query_raw(f"SELECT pg_advisory_xact_lock({SCHEMA_LOCK_KEY})")
+                for statement in SCHEMA_STATEMENTS:
+                    await tx.execute_raw(statement)
+
+            rows = await self.db.query_raw(
+                "SELECT extversion FROM pg_extension WHERE extname = 'vector'"
+            )
+            version = tuple(int(part) for part in rows[0]["extversion"].split(".")[:2])
+            self._iterative_scan = version >= (0, 8)
+            self._index_ready = True
+
+    def _where_clause(
+        self, namespace: str, filter: Optional[Dict], params: List[Any]
+    ) -> str:
+        """Translate a Pinecone-style filter into SQL, appending to params"""
+
+        def placeholder(value: Any) -> str:
+            params.append(value)
+            return f"${len(params)}"
+
+        conditions = [f'e."namespace" = {placeholder(namespace)}']
+        for field, condition in (filter or {}).items():
+            column = _FILTER_COLUMNS.get(field)
+            if column is None:
+                column = f'(e."metadata" ->> {placeholder(field)})'
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+
+            for operator, expected in condition.items():
+                if operator == "$eq":
+                    conditions.append(f"{column} = {placeholder(expected)}")
+                elif operator == "$ne":
+                    conditions.append(f"{column} <> {placeholder(expected)}")
+                elif operator in ("$in", "$nin"):
+                    if not expected:
+                        conditions.append("FALSE" if operator == "$in" else "TRUE")
+                        continue
+                    values = ", ".join(placeholder(value) for value in expected)
+                    negate = "NOT " if operator == "$nin" else ""
+                    conditions.append(f"{column} {negate}IN ({values})")
+                else:
+                    raise ValueError(f"Unsupported filter operator: {operator}")
+
+        return " AND ".join(conditions)
+
+    async def upsert_vectors_async(
+        self, vectors: List[Dict[str, Any]], namespace: str = ""
+    ) -> Dict:
+        if not vectors:
+            return {"upserted_count": 0}
+        await self.ensure_schema()
+
+        params: List[Any] = []
+        rows = []
+        for vector in vectors:
+            metadata = vector.get("metadata", {})
+            start = len(params)
+            params.extend(
+                [
+                    vector["id"],
+                    namespace,
+                    metadata.get("lesson_id"),
+                    metadata.get("type", "content"),
+                    metadata.get("text", ""),
+                    json.dumps(metadata, ensure_ascii=False),
+                    _vector_literal(vector["values"]),
+                ]
+            )
+            rows.append(
+                f"(${start + 1}, ${start + 2}, ${start + 3}, ${start + 4}, "
+                f"${start + 5}, ${start + 6}::jsonb, ${start + 7}::vector, NOW())"
+            )
+
+        await self.db.execute_raw(
+            'INSERT INTO rag."LessonEmbedding" '
+            '("id", "namespace", "lessonId", "type", "text", "metadata", "embedding", "updatedAt") '
+            f"VALUES {', '.join(rows)} "
+            'ON CONFLICT ("namespace", "id") DO UPDATE SET '
+            '"lessonId" = EXCLUDED."lessonId", "type" = EXCLUDED."type", '
+            '"text" = EXCLUDED."text", "metadata" = EXCLUDED."metadata", '
+            '"embedding" = EXCLUDED."embedding", "updatedAt" = NOW()',
+            *params,
+        )
+        return {"upserted_count": len(vectors)}
+
+    async def query_async(
+        self,
+        query_vector: List[float],
+        top_k: int = 5,
+        filter: Optional[Dict] = None,
+        namespace: str = "",
+        include_metadata: bool = True,
+        include_values: bool = False,
+    ) -> Dict:
+        await self.ensure_schema()
+
+        params: List[Any] = [_vector_literal(query_vector)]
+        where = self._where_clause(namespace, filter, params)
+        params.append(top_k)
+        values_column = ', e."embedding"::text AS "values"' if include_values else ""
+
+        sql = (
+            'SELECT e."id", e."metadata", 1 - (e."embedding" <=> $1::vector) AS score'
+            f"{values_column} "
+            'FROM rag."LessonEmbedding" e '
+            'JOIN "Lesson" l ON l."id" = e."lessonId" '
+            f"WHERE {where} "
+            'ORDER BY e."embedding" <=> $1::vector '
+            f"LIMIT ${len(params)}"
+        )
+
+        # The WHERE clause is applied after the HNSW scan, which only looks
+        # at ef_search candidates, so a selective filter could return fewer
+        # than top_k rows. Keep scanning until enough rows pass (0.8+), or
+        # widen the scan; SET LOCAL only lasts for this transaction
+        async with self.db.tx() as tx:
+            if self._iterative_scan:
+                await tx.execute_raw("SET LOCAL hnsw.iterative_scan = relaxed_order")
+            else:
+                ef_search = min(max(settings.PGVECTOR_EF_SEARCH, int(top_k)), 1000)
+                await tx.execute_raw(f"SET LOCAL hnsw.ef_search = {ef_search}")
+            rows = await tx.query_raw(sql, *params)
+        # relaxed_order may return rows slightly out of order
+        rows = sorted(rows, key=lambda row: float(row["score"]), reverse=True)
+
+        matches = []
+        for row in rows:
+            match = {"id": row["id"], "score": float(row["score"])}
+            if include_metadata:
+                metadata = row["metadata"]
+                if isinstance(metadata, str):
+                    metadata = json.loads(metadata)
+                match["metadata"] = metadata or {}
+            if include_values:
+                # pgvector's text form "[1,2,...]" is a JSON array
+                match["values"] = json.loads(row["values"])
+            matches.append(match)
+        return {"matches": matches}
+
+    async def delete_async(
+        self,
+        ids: Optional[List[str]] = None,
+        delete_all: bool = False,
+        namespace: str = "",
+        filter: Optional[Dict] = None,
+    ):
+        params: List[Any] = []
+        if delete_all:
+            where = self._where_clause(namespace, None, params)
+        elif ids:
+            where = self._where_clause(namespace, {"id": {"$in": ids}}, params)
+        elif filter:
+            where = self._where_clause(namespace, filter, params)
+        else:
+            return
+
+        await self.ensure_schema()
+        await self.db.execute_raw(
+            'DELETE FROM rag."LessonEmbedding" e USING "Lesson" l '
+            f'WHERE l."id" = e."lessonId" AND {where}',
+            *params,
+        )
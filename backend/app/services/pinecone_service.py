@@ -1,15 +1,29 @@
 from pinecone import Pinecone, ServerlessSpec
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from typing import List, Dict, Optional
+import asyncio
 import time
 
 from app.core.config import settings
+from app.services.vector_store import VectorStore
 
 
-class PineconeService:
+class PineconeService(VectorStore):
+    """Pinecone backend; created once per worker by get_vector_store()"""
+
     def __init__(self):
         self.pc = Pinecone(api_key=settings.PINECONE_API_KEY)
         self.index_name = settings.PINECONE_INDEX_NAME
         self.dimension = 1536  # text-embedding-3-small dimension
+        self.timeout = settings.PINECONE_TIMEOUT
+
+        # The SDK is synchronous; run its calls on a bounded pool so they
+        # never block the event loop
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.PINECONE_MAX_CONCURRENCY,
+            thread_name_prefix="pinecone",
+        )
 
         # Initialize or get existing index
         self._init_index()
@@ -31,7 +45,12 @@ class PineconeService:
             while not self.pc.describe_index(self.index_name).status["ready"]:
                 time.sleep(1)
 
-        self.index = self.pc.Index(self.index_name)
+        # One keep-alive HTTP connection per executor thread
+        self.index = self.pc.Index(
+            self.index_name,
+            pool_threads=settings.PINECONE_MAX_CONCURRENCY,
+            connection_pool_maxsize=settings.PINECONE_MAX_CONCURRENCY,
+        )
 
     def upsert_vectors(
         self, vectors: List[Dict[str, any]], namespace: str = ""
@@ -56,6 +75,7 @@ class PineconeService:
         filter: Optional[Dict] = None,
         namespace: str = "",
         include_metadata: bool = True,
+        include_values: bool = False,
     ) -> Dict:
         """Query Pinecone index for similar vectors"""
         return self.index.query(
@@ -64,6 +84,7 @@ class PineconeService:
             filter=filter,
             namespace=namespace,
             include_metadata=include_metadata,
+            include_values=include_values,
         )
 
     def delete(
@@ -81,79 +102,56 @@ class PineconeService:
         elif filter:
             self.index.delete(filter=filter, namespace=namespace)
 
-    async def index_lesson_content(
-        self, lesson_id: str, content: Dict, embedding_function
-    ):
-        """Index lesson content in Pinecone"""
-        vectors = []
+    async def _run_async(self, func, *args, **kwargs):
+        """Run a blocking SDK call on the executor with a timeout"""
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(
+            loop.run_in_executor(self.executor, partial(func, *args, **kwargs)),
+            timeout=self.timeout,
+        )
 
-        # Index different parts of the lesson
-        sections = [
-            ("title", content.get("title", "")),
-            ("description", content.get("description", "")),
-        ]
+    async def upsert_vectors_async(
+        self, vectors: List[Dict[str, any]], namespace: str = ""
+    ) -> Dict:
+        """Upsert vectors to Pinecone without blocking the event loop"""
+        return await self._run_async(self.upsert_vectors, vectors, namespace)
+
+    async def query_async(
+        self,
+        query_vector: List[float],
+        top_k: int = 5,
+        filter: Optional[Dict] = None,
+        namespace: str = "",
+        include_metadata: bool = True,
+        include_values: bool = False,
+    ) -> Dict:
+        """Query Pinecone index without blocking the event loop"""
+        return await self._run_async(
+            self.query,
+            query_vector,
+            top_k=top_k,
+            filter=filter,
+            namespace=namespace,
+            include_metadata=include_metadata,
+            include_values=include_values,
+        )
+
+    async def delete_async(
+        self,
+        ids: Optional[List[str]] = None,
+        delete_all: bool = False,
+        namespace: str = "",
+        filter: Optional[Dict] = None,
+    ):
+        """Delete vectors from Pinecone without blocking the event loop"""
+        return await self._run_async(
+            self.delete,
+            ids=ids,
+            delete_all=delete_all,
+            namespace=namespace,
+            filter=filter,
+        )
 
-        # Index vocabulary
-        if "vocabulary" in content:
-            for idx, vocab in enumerate(content["vocabulary"]):
-                text = f"{vocab['hebrew']} - {vocab['english']}"
-                if vocab.get("example"):
-                    text += f" Example: {vocab['example']}"
-
-                embedding = await embedding_function(text)
-                vectors.append(
-                    {
-                        "id": f"{lesson_id}_vocab_{idx}",
-                        "values": embedding,
-                        "metadata": {
-                            "lesson_id": lesson_id,
-                            "type": "vocabulary",
-                            "text": text,
-                            "hebrew": vocab["hebrew"],
-                            "english": vocab["english"],
-                        },
-                    }
-                )
-
-        # Index grammar points
-        if "grammar" in content:
-            for idx, grammar in enumerate(content["grammar"]):
-                text = f"{grammar['rule']} Example: {grammar.get('example', '')}"
-                embedding = await embedding_function(text)
-                vectors.append(
-                    {
-                        "id": f"{lesson_id}_grammar_{idx}",
-                        "values": embedding,
-                        "metadata": {
-                            "lesson_id": lesson_id,
-                            "type": "grammar",
-                            "text": text,
-                        },
-                    }
-                )
-
-        # Index main sections
-        for section_type, text in sections:
-            if text:
-                embedding = await embedding_function(text)
-                vectors.append(
-                    {
-                        "id": f"{lesson_id}_{section_type}",
-                        "values": embedding,
-                        "metadata": {
-                            "lesson_id": lesson_id,
-                            "type": section_type,
-                            "text": text,
-                        },
-                    }
-                )
-
-        # Upsert all vectors
-        if vectors:
-            self.upsert_vectors(vectors)
-            return len(vectors)
-        return 0
-
-
-# Singleton instance
-pinecone_service = PineconeService()
+    def close(self):
+        """Shut down the executor used for async calls"""
+        self.executor.shutdown(wait=False)
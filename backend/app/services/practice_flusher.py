@@ -0,0 +1,149 @@
+from typing import Any, Dict, Optional
+import asyncio
+import time
+
+from app.core.config import settings
+from app.core.database import prisma
+from app.services.redis_service import RedisService, redis_service
+
+
+class VocabularyPracticeFlusher:
+    """
+    Periodically moves pending practice counts from Redis into Postgres
+    Each user's answers since the last flush become one ReviewSession row
+    (reviewType "practice"), so practice traffic never writes per answer
+    """
+
+    def __init__(
+        self,
+        redis_service: RedisService,
+        db=prisma,
+        interval: int = settings.VOCAB_PRACTICE_FLUSH_INTERVAL,
+        batch_size: int = settings.VOCAB_PRACTICE_FLUSH_BATCH,
+    ):
+        self.redis = redis_service
+        self.db = db
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+        # Drained counts that could be neither written nor put back in Redis
+        self._unrestored: Dict[str, Dict[str, int]] = {}
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.sessions_written = 0
+        self.answers_flushed = 0
+        self.last_flush_ms = 0.0
+
+    async def start(self):
+        """Start the background flusher"""
+        if self._task is None:
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and write what is pending"""
+        if self._task is not None:
+            # Signalled rather than cancelled: a cancel landing mid-flush
+            # would lose counts already drained from Redis but not written
+            self._stopping.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                # Never let one bad cycle end the loop; the next one retries
+                try:
+                    await self.flush()
+                except Exception as e:
+                    print(f"Error flushing vocabulary practice: {e}")
+
+    async def flush(self) -> int:
+        """Write pending counts as ReviewSession rows; returns the rows written"""
+        written = 0
+        if self._unrestored:
+            if not await self._restore(self._unrestored):
+                return written
+            self._unrestored = {}
+
+        while True:
+            started = time.perf_counter()
+            try:
+                drained = await self.redis.drain_vocabulary_practice(self.batch_size)
+            except Exception as e:
+                print(f"Error reading pending vocabulary practice: {e}")
+                return written
+            if not drained:
+                return written
+
+            rows = [self._session_row(user_id, pending) for user_id, pending in drained.items()]
+            rows = [row for row in rows if row["itemsReviewed"]]
+            try:
+                if rows:
+                    await self.db.reviewsession.create_many(data=rows)
+            except Exception as e:
+                self.failed_flushes += 1
+                print(f"Error flushing vocabulary practice, will retry: {e}")
+                if not await self._restore(drained):
+                    self._keep_unrestored(drained)
+                return written
+
+            self.flushes += 1
+            self.sessions_written += len(rows)
+            self.answers_flushed += sum(row["itemsReviewed"] for row in rows)
+            self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+            written += len(rows)
+            if len(drained) < self.batch_size:
+                return written
+
+    async def _restore(self, drained: Dict[str, Dict[str, int]]) -> bool:
+        try:
+            await self.redis.restore_vocabulary_practice(drained)
+        except Exception as e:
+            print(
+                f"Error restoring vocabulary practice, "
+                f"holding {len(drained)} users in memory: {e}"
+            )
+            return False
+        return True
+
+    def _keep_unrestored(self, drained: Dict[str, Dict[str, int]]):
+        for user_id, pending in drained.items():
+            kept = self._unrestored.get(user_id)
+            if kept is None:
+                self._unrestored[user_id] = dict(pending)
+                continue
+            kept["correct"] = kept.get("correct", 0) + pending.get("correct", 0)
+            kept["incorrect"] = kept.get("incorrect", 0) + pending.get("incorrect", 0)
+            kept["first_at"] = min(kept["first_at"], pending["first_at"])
+            kept["last_at"] = max(kept["last_at"], pending["last_at"])
+
+    def _session_row(self, user_id: str, pending: Dict[str, int]) -> Dict[str, Any]:
+        correct = pending.get("correct", 0)
+        answered = correct + pending.get("incorrect", 0)
+        span_ms = pending.get("last_at", 0) - pending.get("first_at", 0)
+        return {
+            "userId": user_id,
+            "duration": max(1, round(span_ms / 60000)),  # Minutes
+            "itemsReviewed": answered,
+            "reviewType": "practice",
+            "score": round(100 * correct / answered) if answered else None,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "sessions_written": self.sessions_written,
+            "answers_flushed": self.answers_flushed,
+            "last_flush_ms": self.last_flush_ms,
+            "unrestored_users": len(self._unrestored),
+        }
+
+
+# Singleton instance
+vocabulary_practice_flusher = VocabularyPracticeFlusher(redis_service)
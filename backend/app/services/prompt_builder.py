@@ -0,0 +1,156 @@
+from typing import Callable, Dict, List, Any, Optional
+
+import tiktoken
+
+from app.core.config import settings
+
+# Per-message overhead of the chat format (role markers and separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+# Tokens taken by the blank line between context chunks
+CHUNK_SEPARATOR_TOKENS = 1
+
+
+class PromptBuilder:
+    """
+    Assembles chat prompts within a per-section token budget
+    Sections are the system prompt, the RAG context, the conversation history
+    and the new user message; history is trimmed oldest-first and context is
+    cut chunk by chunk
+    """
+
+    def __init__(
+        self,
+        model: str = settings.OPENAI_MODEL,
+        system_budget: int = settings.PROMPT_SYSTEM_TOKEN_BUDGET,
+        context_budget: int = settings.PROMPT_CONTEXT_TOKEN_BUDGET,
+        history_budget: int = settings.PROMPT_HISTORY_TOKEN_BUDGET,
+        user_budget: int = settings.PROMPT_USER_TOKEN_BUDGET,
+    ):
+        self.model = model
+        self.system_budget = system_budget
+        self.context_budget = context_budget
+        self.history_budget = history_budget
+        self.user_budget = user_budget
+        self._encoding = None
+
+    @property
+    def encoding(self):
+        # Loaded lazily: tiktoken fetches the BPE ranks on first use
+        if self._encoding is None:
+            try:
+                self._encoding = tiktoken.encoding_for_model(self.model)
+            except KeyError:
+                self._encoding = tiktoken.get_encoding("cl100k_base")
+        return self._encoding
+
+    def count(self, text: str) -> int:
+        """Number of tokens in text"""
+        if not text:
+            return 0
+        return len(self.encoding.encode(text))
+
+    def count_message(self, message: Dict[str, str]) -> int:
+        return MESSAGE_OVERHEAD_TOKENS + self.count(message.get("content", ""))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text down to at most max_tokens tokens"""
+        if max_tokens <= 0:
+            return ""
+        tokens = self.encoding.encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+        return self.encoding.decode(tokens[:max_tokens])
+
+    def fit_context(self, context: str, max_tokens: int) -> str:
+        """Keep whole RAG chunks (best first) and truncate the one that overflows"""
+        pieces = []
+        remaining = max_tokens
+        for chunk in (c for c in context.split("\n\n") if c.strip()):
+            if remaining <= 0:
+                break
+            chunk_tokens = self.count(chunk)
+            if chunk_tokens > remaining:
+                chunk = self.truncate(chunk, remaining)
+                chunk_tokens = remaining
+            pieces.append(chunk)
+            remaining -= chunk_tokens
+        return "\n\n".join(pieces)
+
+    def pack_chunks(self, chunks: List[str], max_tokens: Optional[int] = None) -> str:
+        """
+        Join whole chunks, best first, while they fit the context budget
+        Chunks that would overflow are skipped rather than cut, so a smaller
+        one further down can still use the room; repeated chunks are dropped
+        """
+        remaining = self.context_budget if max_tokens is None else max_tokens
+        pieces = []
+        seen = set()
+        for chunk in chunks:
+            key = " ".join(chunk.split())
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            chunk_tokens = self.count(chunk) + (CHUNK_SEPARATOR_TOKENS if pieces else 0)
+            if chunk_tokens > remaining:
+                continue
+            pieces.append(chunk)
+            remaining -= chunk_tokens
+        return "\n\n".join(pieces)
+
+    def fit_history(
+        self, history: List[Dict[str, str]], max_tokens: int
+    ) -> List[Dict[str, str]]:
+        """Keep the most recent turns that fit, dropping the oldest first"""
+        kept = []
+        remaining = max_tokens
+        for message in reversed(history):
+            message_tokens = self.count_message(message)
+            if message_tokens > remaining:
+                break
+            kept.append(message)
+            remaining -= message_tokens
+        kept.reverse()
+        return kept
+
+    def build(
+        self,
+        system_prompt: Callable[[str], str],
+        context: str,
+        history: List[Dict[str, str]],
+        user_message: str,
+    ) -> Dict[str, Any]:
+        """
+        Build the system prompt and message list for a chat completion
+        system_prompt renders the system prompt around the (fitted) context
+        Returns {"system_prompt", "messages", "token_counts"}
+        """
+        context = self.fit_context(context, self.context_budget)
+        rendered_system = system_prompt(context)
+
+        # The context budget is enforced above; the rest of the system
+        # prompt gets its own budget
+        context_tokens = self.count(context)
+        system_tokens = self.count(rendered_system) - context_tokens
+        if system_tokens > self.system_budget:
+            rendered_system = self.truncate(
+                rendered_system, self.system_budget + context_tokens
+            )
+            system_tokens = self.system_budget
+
+        user_message = self.truncate(user_message, self.user_budget)
+        user_turn = {"role": "user", "content": user_message}
+        history = self.fit_history(history, self.history_budget)
+
+        token_counts = {
+            "system": system_tokens + MESSAGE_OVERHEAD_TOKENS,
+            "context": context_tokens,
+            "history": sum(self.count_message(m) for m in history),
+            "user": self.count_message(user_turn),
+        }
+        token_counts["total"] = sum(token_counts.values())
+
+        return {
+            "system_prompt": rendered_system,
+            "messages": history + [user_turn],
+            "token_counts": token_counts,
+        }
@@ -0,0 +1,224 @@
+from dataclasses import dataclass
+from typing import Dict
+import math
+import time
+import uuid
+
+from app.core.config import settings
+from app.services.redis_service import RedisService, redis_service
+
+# Sliding window log: one sorted-set member per request, scored by time (ms)
+SLIDING_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+local count = redis.call('ZCARD', key)
+if count < limit then
+    redis.call('ZADD', key, now, ARGV[4])
+    redis.call('PEXPIRE', key, window)
+    local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+    return {1, limit - count - 1, window - (now - tonumber(oldest[2]))}
+end
+local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+local retry = window - (now - tonumber(oldest[2]))
+return {0, 0, retry}
+"""
+
+# Token bucket: tokens refill continuously up to capacity
+TOKEN_BUCKET_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local refill_per_ms = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * refill_per_ms)
+local allowed = 0
+local retry = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry = math.ceil((1 - tokens) / refill_per_ms)
+end
+redis.call('HSET', key, 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', key, math.ceil(capacity / refill_per_ms))
+return {allowed, math.floor(tokens), math.ceil((capacity - tokens) / refill_per_ms), retry}
+"""
+
+
+# Python equivalents of the scripts for the in-memory backend, where
+# commands never yield to the event loop and so run atomically
+async def _sliding_window(client, key: str, args: list) -> list:
+    now, window, limit, member = args
+    await client.zremrangebyscore(key, 0, now - window)
+    count = await client.zcard(key)
+    if count < limit:
+        await client.zadd(key, {member: now})
+        await client.pexpire(key, window)
+    oldest = (await client.zrange(key, 0, 0, withscores=True))[0][1]
+    retry = window - (now - oldest)
+    if count < limit:
+        return [1, limit - count - 1, retry]
+    return [0, 0, retry]
+
+
+async def _token_bucket(client, key: str, args: list) -> list:
+    now, capacity, refill_per_ms = args
+    tokens, ts = await client.hmget(key, "tokens", "ts")
+    tokens = float(tokens) if tokens is not None else capacity
+    ts = float(ts) if ts is not None else now
+    tokens = min(capacity, tokens + max(0, now - ts) * refill_per_ms)
+    allowed, retry = 0, 0
+    if tokens >= 1:
+        tokens -= 1
+        allowed = 1
+    else:
+        retry = math.ceil((1 - tokens) / refill_per_ms)
+    await client.hset(key, mapping={"tokens": tokens, "ts": now})
+    await client.pexpire(key, math.ceil(capacity / refill_per_ms))
+    return [
+        allowed,
+        math.floor(tokens),
+        math.ceil((capacity - tokens) / refill_per_ms),
+        retry,
+    ]
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    limit: int  # Requests per window, or bucket capacity
+    window: int  # Seconds for the window, or to refill an empty bucket
+    mode: str = "sliding_window"  # "sliding_window" or "token_bucket"
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float  # Seconds until the limit fully resets
+    retry_after: float = 0.0  # Seconds until the next request may succeed
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(max(self.remaining, 0)),
+            "X-RateLimit-Reset": str(math.ceil(self.reset_after)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(math.ceil(self.retry_after), 1))
+        return headers
+
+
+# Per-route policies
+RATE_LIMIT_POLICIES: Dict[str, RateLimitPolicy] = {
+    "chat": RateLimitPolicy(
+        limit=settings.RATE_LIMIT_CHAT_LIMIT,
+        window=settings.RATE_LIMIT_CHAT_WINDOW,
+        mode=settings.RATE_LIMIT_CHAT_MODE,
+    ),
+}
+
+
+class RateLimiter:
+    """
+    Atomic Redis rate limiter (one Lua round trip per check)
+    The in-memory backend runs the same algorithms in Python instead.
+    Clients that were just rejected are remembered in-process until their
+    Retry-After passes, so repeat offenders are turned away without Redis
+    """
+
+    def __init__(
+        self,
+        redis_service: RedisService,
+        policies: Dict[str, RateLimitPolicy] = RATE_LIMIT_POLICIES,
+    ):
+        self.redis = redis_service
+        self.policies = policies
+        self._scripts = {}
+        self._script_client = None
+        self._blocked_until: Dict[str, float] = {}
+        self.local_rejections = 0
+
+    async def _run(self, mode: str, key: str, args: list) -> list:
+        if not self.redis.redis_client:
+            await self.redis.connect()
+        client = self.redis.redis_client
+
+        if self.redis.backend == "memory":
+            run = {"sliding_window": _sliding_window, "token_bucket": _token_bucket}[mode]
+            return await run(client, key, args)
+
+        # Scripts are bound to a client, which changes after a failover
+        if client is not self._script_client:
+            self._scripts = {}
+            self._script_client = client
+        if mode not in self._scripts:
+            source = {
+                "sliding_window": SLIDING_WINDOW_SCRIPT,
+                "token_bucket": TOKEN_BUCKET_SCRIPT,
+            }[mode]
+            self._scripts[mode] = client.register_script(source)
+        return await self._scripts[mode](keys=[key], args=args)
+
+    async def check(self, route: str, identity: str) -> RateLimitResult:
+        """Count a request from identity against route's policy"""
+        policy = self.policies[route]
+        key = f"rate_limit:{route}:{policy.mode}:{identity}"
+
+        # Local pre-check: still inside a Retry-After we already handed out
+        blocked_until = self._blocked_until.get(key)
+        if blocked_until is not None:
+            wait = blocked_until - time.monotonic()
+            if wait > 0:
+                self.local_rejections += 1
+                return RateLimitResult(False, policy.limit, 0, wait, wait)
+            del self._blocked_until[key]
+
+        now_ms = int(time.time() * 1000)
+        window_ms = policy.window * 1000
+
+        if policy.mode == "token_bucket":
+            allowed, remaining, reset_ms, retry_ms = await self._run(
+                policy.mode, key, [now_ms, policy.limit, policy.limit / window_ms]
+            )
+        else:
+            allowed, remaining, retry_ms = await self._run(
+                policy.mode,
+                key,
+                [now_ms, window_ms, policy.limit, f"{now_ms}-{uuid.uuid4().hex}"],
+            )
+            reset_ms = retry_ms
+
+        result = RateLimitResult(
+            allowed=bool(allowed),
+            limit=policy.limit,
+            remaining=int(remaining),
+            reset_after=int(reset_ms) / 1000,
+            retry_after=0.0 if allowed else int(retry_ms) / 1000,
+        )
+        if not result.allowed:
+            self._remember_block(key, result.retry_after)
+        return result
+
+    def _remember_block(self, key: str, retry_after: float):
+        now = time.monotonic()
+        if len(self._blocked_until) >= 10000:
+            self._blocked_until = {
+                k: until for k, until in self._blocked_until.items() if until > now
+            }
+        self._blocked_until[key] = now + retry_after
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "local_rejections": self.local_rejections,
+            "locally_blocked": len(self._blocked_until),
+        }
+
+
+# Singleton instance
+rate_limiter = RateLimiter(redis_service)
@@ -1,39 +1,168 @@
 import redis.asyncio as redis
-import json
-from typing import Optional, Any, List
-from datetime import timedelta
+from redis.exceptions import ResponseError
+from contextlib import asynccontextmanager
+from typing import Optional, Any, List, Dict, AsyncIterator
+from datetime import datetime, timedelta
+import asyncio
+import time
+import uuid
 
 from app.core.config import settings
+from app.services.codec import CacheCodec
+from app.services.memory_redis import InMemoryRedis
 
 
 class RedisService:
     def __init__(self):
         self.redis_client: Optional[redis.Redis] = None
+        self.codec = CacheCodec()
+        self.backend: Optional[str] = None  # "redis" or "memory" once connected
+        self.failovers = 0
+        self.failed_over_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self._health_task: Optional[asyncio.Task] = None
+
+    @property
+    def failed_over(self) -> bool:
+        """True while "auto" mode is serving from memory because Redis is down"""
+        return self.failed_over_at is not None
 
     async def connect(self):
-        """Connect to Redis"""
-        if not self.redis_client:
-            self.redis_client = await redis.from_url(
-                settings.REDIS_URL, encoding="utf-8", decode_responses=True
-            )
+        """Connect to the configured backend"""
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+
+        async with self._connect_lock:
+            if self.redis_client:
+                return
+
+            if settings.REDIS_BACKEND == "memory" or not settings.REDIS_URL:
+                self.redis_client = InMemoryRedis(settings.MEMORY_BACKEND_MAX_KEYS)
+                self.backend = "memory"
+                return
+
+            try:
+                self.redis_client = await self._connect_redis()
+                self.backend = "redis"
+            except Exception as e:
+                if settings.REDIS_BACKEND != "auto":
+                    raise
+                self._fail_over(e)
+
+    async def _connect_redis(self) -> redis.Redis:
+        # One bounded pool per worker, shared by every service; when it is
+        # exhausted callers wait for a free connection instead of failing.
+        # Raw bytes: values are encoded/decoded by the cache codec and
+        # binary payloads (e.g. embeddings) are stored as-is
+        pool = redis.BlockingConnectionPool.from_url(
+            settings.REDIS_URL,
+            encoding="utf-8",
+            decode_responses=False,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_keepalive=True,
+            health_check_interval=settings.REDIS_CONNECTION_HEALTH_CHECK,
+        )
+        client = redis.Redis(connection_pool=pool)
+        if settings.REDIS_BACKEND == "auto":
+            try:
+                await client.ping()
+            except Exception:
+                await client.aclose(close_connection_pool=True)
+                raise
+        return client
+
+    def _fail_over(self, error: Exception):
+        print(f"Warning: Redis unreachable, failing over to in-memory backend: {error}")
+        self.redis_client = InMemoryRedis(settings.MEMORY_BACKEND_MAX_KEYS)
+        self.backend = "memory"
+        self.failovers += 1
+        self.failed_over_at = datetime.utcnow()
+        self.last_error = str(error)
+
+    async def start_health_check(self):
+        """In "auto" mode, probe Redis and switch backends as it goes down or comes back"""
+        if settings.REDIS_BACKEND == "auto" and settings.REDIS_URL and not self._health_task:
+            self._health_task = asyncio.create_task(self._health_check())
+
+    async def _health_check(self):
+        while True:
+            await asyncio.sleep(settings.REDIS_HEALTH_CHECK_INTERVAL)
+            if not self.redis_client:
+                continue
+
+            if self.backend == "redis":
+                try:
+                    await self.redis_client.ping()
+                except Exception as e:
+                    stale = self.redis_client
+                    self._fail_over(e)
+                    try:
+                        await stale.aclose(close_connection_pool=True)
+                    except Exception:
+                        pass
+                continue
+
+            # Failed over: switch back once Redis answers again. Whatever
+            # was written to memory meanwhile (caches, counters) is dropped
+            try:
+                client = await self._connect_redis()
+            except Exception as e:
+                self.last_error = str(e)
+                continue
+            print("Redis reachable again, leaving in-memory backend")
+            self.redis_client = client
+            self.backend = "redis"
+            self.failed_over_at = None
 
     async def disconnect(self):
         """Disconnect from Redis"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
         if self.redis_client:
-            await self.redis_client.close()
+            if self.backend == "redis":
+                await self.redis_client.aclose(close_connection_pool=True)
+            else:
+                await self.redis_client.close()
+            self.redis_client = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": settings.REDIS_BACKEND,
+            "backend": self.backend,
+            "failed_over": self.failed_over,
+            "failed_over_at": self.failed_over_at.isoformat() if self.failed_over_at else None,
+            "failovers": self.failovers,
+            "last_error": self.last_error,
+            "pool": self.pool_stats(),
+        }
+
+    def pool_stats(self) -> Optional[Dict[str, int]]:
+        """Connection pool usage (None for the in-memory backend)"""
+        pool = getattr(self.redis_client, "connection_pool", None)
+        if pool is None:
+            return None
+        return {
+            "max_connections": pool.max_connections,
+            "created": getattr(pool, "_created_connections", 0),
+            "available": len(getattr(pool, "_available_connections", [])),
+            "in_use": len(getattr(pool, "_in_use_connections", [])),
+        }
 
     async def get(self, key: str) -> Optional[Any]:
         """Get value from Redis"""
         if not self.redis_client:
             await self.connect()
 
-        value = await self.redis_client.get(key)
-        if value:
-            try:
-                return json.loads(value)
-            except json.JSONDecodeError:
-                return value
-        return None
+        return self._decode(await self.redis_client.get(key))
 
     async def set(
         self, key: str, value: Any, expiry: Optional[int] = None
@@ -42,8 +171,91 @@ class RedisService:
         if not self.redis_client:
             await self.connect()
 
-        if isinstance(value, (dict, list)):
-            value = json.dumps(value)
+        value = self._encode(value)
+
+        if expiry:
+            return await self.redis_client.setex(key, expiry, value)
+        return await self.redis_client.set(key, value)
+
+    def _encode(self, value: Any) -> bytes:
+        return self.codec.encode(value)
+
+    def _decode(self, value: Optional[bytes]) -> Optional[Any]:
+        return self.codec.decode(value)
+
+    # Bulk operations (one round trip each)
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """Get several values at once; missing keys come back as None"""
+        if not keys:
+            return []
+        if not self.redis_client:
+            await self.connect()
+
+        return [self._decode(value) for value in await self.redis_client.mget(keys)]
+
+    async def mset(
+        self, mapping: Dict[str, Any], expiry: Optional[int] = None
+    ) -> bool:
+        """Set several values at once with an optional shared expiry"""
+        if not mapping:
+            return True
+
+        async with self.pipeline() as pipe:
+            if expiry:
+                for key, value in mapping.items():
+                    pipe.setex(key, expiry, self._encode(value))
+            else:
+                pipe.mset({key: self._encode(v) for key, v in mapping.items()})
+            results = await pipe.execute()
+        return all(results)
+
+    @asynccontextmanager
+    async def pipeline(self, transaction: bool = True) -> AsyncIterator[Any]:
+        """
+        Queue commands and send them in one round trip:
+
+            async with redis_service.pipeline() as pipe:
+                pipe.incr("a")
+                pipe.expire("a", 60)
+                results = await pipe.execute()
+
+        With transaction=True the commands run as one MULTI/EXEC block
+        """
+        if not self.redis_client:
+            await self.connect()
+
+        async with self.redis_client.pipeline(transaction=transaction) as pipe:
+            yield pipe
+
+    async def delete_pattern(self, pattern: str, batch_size: int = 500) -> int:
+        """Delete all keys matching pattern using SCAN (never KEYS)"""
+        if not self.redis_client:
+            await self.connect()
+
+        deleted = 0
+        batch = []
+        async for key in self.redis_client.scan_iter(match=pattern, count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                deleted += await self.redis_client.delete(*batch)
+                batch = []
+        if batch:
+            deleted += await self.redis_client.delete(*batch)
+        return deleted
+
+    async def get_bytes(self, key: str) -> Optional[bytes]:
+        """Get raw binary value from Redis"""
+        if not self.redis_client:
+            await self.connect()
+
+        return await self.redis_client.get(key)
+
+    async def set_bytes(
+        self, key: str, value: bytes, expiry: Optional[int] = None
+    ) -> bool:
+        """Set raw binary value in Redis with optional expiry (in seconds)"""
+        if not self.redis_client:
+            await self.connect()
 
         if expiry:
             return await self.redis_client.setex(key, expiry, value)
@@ -63,29 +275,91 @@ class RedisService:
 
         return await self.redis_client.exists(key) > 0
 
+    # Short-lived locks
+    async def acquire_lock(self, key: str, ttl_ms: int) -> Optional[str]:
+        """Take key as a lock for ttl_ms; returns its token, or None if held"""
+        if not self.redis_client:
+            await self.connect()
+
+        token = uuid.uuid4().hex
+        if await self.redis_client.set(key, token, px=ttl_ms, nx=True):
+            return token
+        return None
+
+    async def release_lock(self, key: str, token: str):
+        """Release a lock taken with acquire_lock if it is still ours"""
+        if not self.redis_client:
+            await self.connect()
+
+        # Not atomic: if the lock expired in between, a fresh holder loses it
+        # early, which only costs that holder's waiters a duplicate fetch
+        if await self.redis_client.get(key) == token.encode():
+            await self.redis_client.delete(key)
+
     # Conversation-specific methods
+    # Conversations are Redis lists with one encoded message per item, so
+    # appends are O(1) and atomic and recent turns can be read by range
     async def cache_conversation(
         self, conversation_id: str, messages: List[dict], expiry: int = 3600
     ):
-        """Cache conversation messages"""
+        """Cache conversation messages, replacing any cached copy"""
         key = f"conversation:{conversation_id}"
-        await self.set(key, messages, expiry)
+        async with self.pipeline() as pipe:
+            pipe.delete(key)
+            if messages:
+                pipe.rpush(key, *(self._encode(m) for m in messages))
+                pipe.ltrim(key, -settings.CONVERSATION_CACHE_MAX_MESSAGES, -1)
+                pipe.expire(key, expiry)
+            await pipe.execute()
 
     async def get_cached_conversation(
-        self, conversation_id: str
+        self, conversation_id: str, start: int = 0, end: int = -1
     ) -> Optional[List[dict]]:
-        """Get cached conversation"""
+        """
+        Get cached conversation messages between start and end (inclusive,
+        negative indexes count from the newest message)
+        """
+        if not self.redis_client:
+            await self.connect()
+
         key = f"conversation:{conversation_id}"
-        return await self.get(key)
+        try:
+            items = await self.redis_client.lrange(key, start, end)
+        except ResponseError:
+            # Entry written in the old single-JSON-blob format
+            await self.redis_client.delete(key)
+            return None
+
+        if not items:
+            return None
+        return [self._decode(item) for item in items]
+
+    async def append_messages(
+        self, conversation_id: str, messages: List[dict], expiry: int = 3600
+    ):
+        """Append messages to cached conversation in one round trip"""
+        key = f"conversation:{conversation_id}"
+        async with self.pipeline() as pipe:
+            pipe.rpush(key, *(self._encode(m) for m in messages))
+            pipe.ltrim(key, -settings.CONVERSATION_CACHE_MAX_MESSAGES, -1)
+            pipe.expire(key, expiry)
+            await pipe.execute()
 
     async def append_message(
         self, conversation_id: str, message: dict, expiry: int = 3600
     ):
         """Append message to cached conversation"""
-        key = f"conversation:{conversation_id}"
-        messages = await self.get_cached_conversation(conversation_id) or []
-        messages.append(message)
-        await self.set(key, messages, expiry)
+        await self.append_messages(conversation_id, [message], expiry)
+
+    async def set_conversation_owner(
+        self, conversation_id: str, user_id: str, expiry: int = 3600
+    ):
+        """Cache which user a conversation belongs to"""
+        await self.set(f"conversation:{conversation_id}:owner", user_id, expiry)
+
+    async def get_conversation_owner(self, conversation_id: str) -> Optional[str]:
+        """Cached owner (user id) of a conversation"""
+        return await self.get(f"conversation:{conversation_id}:owner")
 
     # User session methods
     async def cache_user_session(
@@ -100,53 +374,110 @@ class RedisService:
         key = f"session:{user_id}"
         return await self.get(key)
 
-    # Rate limiting
-    async def check_rate_limit(
-        self, user_id: str, limit: int = 100, window: int = 3600
-    ) -> tuple[bool, int]:
+    # Vocabulary practice tracking
+    # Per-user hash vocab_practice:{user_id} with {word}:correct,
+    # {word}:incorrect and {word}:last_practiced fields, plus a pending hash
+    # of answers not yet flushed to Postgres and a set of users that have one
+    async def track_vocabulary_practice(
+        self, user_id: str, word: str, is_correct: bool
+    ):
+        """Track vocabulary practice for spaced repetition"""
+        await self.track_vocabulary_practice_batch(user_id, {word: is_correct})
+
+    async def track_vocabulary_practice_batch(
+        self, user_id: str, results: Dict[str, bool]
+    ):
         """
-        Check if user has exceeded rate limit
-        Returns: (is_allowed, remaining_requests)
+        Track several practice answers at once (word -> is_correct)
+        Costs one pipelined round trip regardless of the word count
         """
-        if not self.redis_client:
-            await self.connect()
+        if not results:
+            return
 
-        key = f"rate_limit:{user_id}"
-        current = await self.redis_client.get(key)
+        key = f"vocab_practice:{user_id}"
+        pending_key = f"{key}:pending"
+        now = datetime.utcnow()
+        now_ms = int(time.time() * 1000)
+        correct = sum(1 for is_correct in results.values() if is_correct)
+        incorrect = len(results) - correct
 
-        if current is None:
-            await self.redis_client.setex(key, window, 1)
-            return True, limit - 1
+        async with self.pipeline() as pipe:
+            for word, is_correct in results.items():
+                pipe.hincrby(key, f"{word}:{'correct' if is_correct else 'incorrect'}", 1)
+                pipe.hset(key, f"{word}:last_practiced", now.isoformat())
+            pipe.expire(key, settings.VOCAB_PRACTICE_TTL)
 
-        current_count = int(current)
-        if current_count >= limit:
-            return False, 0
+            pipe.hincrby(pending_key, "correct", correct)
+            pipe.hincrby(pending_key, "incorrect", incorrect)
+            pipe.hsetnx(pending_key, "first_at", now_ms)
+            pipe.hset(pending_key, "last_at", now_ms)
+            pipe.expire(pending_key, settings.VOCAB_PRACTICE_TTL)
+            pipe.sadd("vocab_practice:dirty", user_id)
+            await pipe.execute()
 
-        await self.redis_client.incr(key)
-        return True, limit - current_count - 1
+    async def get_vocabulary_practice(self, user_id: str) -> Dict[str, Dict[str, Any]]:
+        """Practice counters per word: {"correct", "incorrect", "last_practiced"}"""
+        if not self.redis_client:
+            await self.connect()
 
-    # Vocabulary practice tracking
-    async def track_vocabulary_practice(
-        self, user_id: str, word: str, is_correct: bool
-    ):
-        """Track vocabulary practice for spaced repetition"""
-        key = f"vocab:{user_id}:{word}"
-        data = await self.get(key) or {
-            "correct": 0,
-            "incorrect": 0,
-            "last_practiced": None,
-        }
+        fields = await self.redis_client.hgetall(f"vocab_practice:{user_id}")
+        words: Dict[str, Dict[str, Any]] = {}
+        for field, value in fields.items():
+            word, name = field.decode("utf-8").rsplit(":", 1)
+            stats = words.setdefault(
+                word, {"correct": 0, "incorrect": 0, "last_practiced": None}
+            )
+            stats[name] = value.decode("utf-8") if name == "last_practiced" else int(value)
+        return words
+
+    async def drain_vocabulary_practice(
+        self, limit: int
+    ) -> Dict[str, Dict[str, int]]:
+        """
+        Atomically take up to limit users' pending practice counts
+        Returns user_id -> {"correct", "incorrect", "first_at", "last_at"}
+        """
+        if not self.redis_client:
+            await self.connect()
+
+        # SPOP takes just this batch instead of reading the whole set; a
+        # user who answers again in between is re-added by the next SADD
+        members = await self.redis_client.spop("vocab_practice:dirty", limit)
+        user_ids = [m.decode("utf-8") for m in members or []]
+        if not user_ids:
+            return {}
 
-        if is_correct:
-            data["correct"] += 1
-        else:
-            data["incorrect"] += 1
+        async with self.pipeline() as pipe:
+            for user_id in user_ids:
+                pending_key = f"vocab_practice:{user_id}:pending"
+                pipe.hgetall(pending_key)
+                pipe.delete(pending_key)
+            results = await pipe.execute()
 
-        from datetime import datetime
+        drained = {}
+        for user_id, pending in zip(user_ids, results[::2]):
+            if pending:
+                drained[user_id] = {
+                    field.decode("utf-8"): int(value) for field, value in pending.items()
+                }
+        return drained
 
-        data["last_practiced"] = datetime.utcnow().isoformat()
+    async def restore_vocabulary_practice(self, drained: Dict[str, Dict[str, int]]):
+        """Put drained counts back (e.g. after a failed flush)"""
+        if not drained:
+            return
 
-        await self.set(key, data, expiry=86400 * 30)  # 30 days
+        async with self.pipeline() as pipe:
+            for user_id, pending in drained.items():
+                pending_key = f"vocab_practice:{user_id}:pending"
+                pipe.hincrby(pending_key, "correct", pending.get("correct", 0))
+                pipe.hincrby(pending_key, "incorrect", pending.get("incorrect", 0))
+                # Newer answers may have set these since; keep the earliest start
+                pipe.hset(pending_key, "first_at", pending["first_at"])
+                pipe.hsetnx(pending_key, "last_at", pending["last_at"])
+                pipe.expire(pending_key, settings.VOCAB_PRACTICE_TTL)
+                pipe.sadd("vocab_practice:dirty", user_id)
+            await pipe.execute()
 
 
 # Singleton instance
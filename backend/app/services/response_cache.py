@@ -0,0 +1,185 @@
+from typing import Any, Dict, List, Optional, Tuple
+import struct
+import time
+import uuid
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.redis_service import RedisService
+
+# Vector entries are a float64 creation time followed by the float32 vector
+CREATED_AT = struct.Struct("d")
+
+
+class ResponseCache:
+    """
+    Semantic cache of tutor answers for first turns (no personal history)
+    Answers are bucketed by (level, lesson) and matched by cosine similarity
+    of the question embedding. Each bucket is two Redis hashes, vectors and
+    responses; workers mirror a bucket's vectors in NumPy for local_ttl
+    seconds so a lookup costs one matrix product and, on a hit, one HGET
+    """
+
+    def __init__(
+        self,
+        redis_service: RedisService,
+        threshold: float = settings.RESPONSE_CACHE_THRESHOLD,
+        ttl: int = settings.RESPONSE_CACHE_TTL,
+        max_entries: int = settings.RESPONSE_CACHE_MAX_ENTRIES,
+        local_ttl: int = settings.RESPONSE_CACHE_LOCAL_TTL,
+    ):
+        self.redis = redis_service
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.local_ttl = local_ttl
+        # bucket -> (loaded_at, ids, created_at, unit vectors)
+        self._buckets: Dict[str, Tuple[float, List[str], np.ndarray, np.ndarray]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.lookup_ms = 0.0
+        self.hit_similarity = 0.0
+
+    def _bucket(self, user_level: str, lesson_id: Optional[str]) -> str:
+        return f"response_cache:{user_level}:{lesson_id or 'general'}"
+
+    @staticmethod
+    def _unit(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    async def _load_bucket(self, bucket: str):
+        cached = self._buckets.get(bucket)
+        if cached and time.monotonic() - cached[0] < self.local_ttl:
+            return cached
+
+        if not self.redis.redis_client:
+            await self.redis.connect()
+        raw = await self.redis.redis_client.hgetall(f"{bucket}:vectors")
+        loaded = self._parse_bucket(raw)
+        self._buckets[bucket] = loaded
+        return loaded
+
+    @staticmethod
+    def _parse_bucket(
+        raw: Dict[bytes, bytes]
+    ) -> Tuple[float, List[str], np.ndarray, np.ndarray]:
+        """Turn a bucket's vectors hash into (loaded_at, ids, created_at, vectors)"""
+        ids, created, vectors = [], [], []
+        for entry_id, payload in raw.items():
+            ids.append(entry_id.decode("utf-8"))
+            created.append(CREATED_AT.unpack_from(payload)[0])
+            vectors.append(np.frombuffer(payload, dtype=np.float32, offset=CREATED_AT.size))
+
+        return (
+            time.monotonic(),
+            ids,
+            np.asarray(created, dtype=np.float64),
+            np.vstack(vectors) if vectors else np.empty((0, 0), dtype=np.float32),
+        )
+
+    async def lookup(
+        self, user_level: str, lesson_id: Optional[str], embedding: List[float]
+    ) -> Optional[Dict[str, Any]]:
+        """Return a cached answer to a semantically equivalent question, if any"""
+        started = time.perf_counter()
+        try:
+            bucket = self._bucket(user_level, lesson_id)
+            _, ids, created, vectors = await self._load_bucket(bucket)
+            if not ids:
+                self.misses += 1
+                return None
+
+            similarities = vectors @ self._unit(embedding)
+            similarities[created < time.time() - self.ttl] = -1.0
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            cached = self.redis.codec.decode(
+                await self.redis.redis_client.hget(f"{bucket}:responses", ids[best])
+            )
+            if cached is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.hit_similarity += float(similarities[best])
+            return cached
+        except Exception as e:
+            print(f"Warning: response cache lookup failed: {e}")
+            self.misses += 1
+            return None
+        finally:
+            self.lookup_ms += (time.perf_counter() - started) * 1000
+
+    async def store(
+        self,
+        user_level: str,
+        lesson_id: Optional[str],
+        embedding: List[float],
+        response: Dict[str, Any],
+    ):
+        """
+        Cache an answer; the oldest entries are evicted from a full bucket
+        Eviction works from the bucket as Redis holds it after the write (read
+        in the same transaction), so entries written by other workers count
+        toward max_entries and the refreshed local mirror includes them
+        """
+        try:
+            bucket = self._bucket(user_level, lesson_id)
+            vectors_key = f"{bucket}:vectors"
+            responses_key = f"{bucket}:responses"
+            entry_id = uuid.uuid4().hex
+            unit = self._unit(embedding)
+
+            async with self.redis.pipeline() as pipe:
+                pipe.hset(vectors_key, entry_id, CREATED_AT.pack(time.time()) + unit.tobytes())
+                pipe.hset(responses_key, entry_id, self.redis.codec.encode(response))
+                pipe.expire(vectors_key, self.ttl)
+                pipe.expire(responses_key, self.ttl)
+                pipe.hgetall(vectors_key)
+                raw = (await pipe.execute())[-1]
+
+            loaded_at, ids, created, vectors = self._parse_bucket(raw)
+            excess = len(ids) - self.max_entries
+            if excess > 0:
+                oldest = set(np.argsort(created)[:excess].tolist())
+                evicted = [ids[i] for i in oldest]
+                async with self.redis.pipeline() as pipe:
+                    pipe.hdel(vectors_key, *evicted)
+                    pipe.hdel(responses_key, *evicted)
+                    await pipe.execute()
+                keep = [i for i in range(len(ids)) if i not in oldest]
+                ids, created, vectors = [ids[i] for i in keep], created[keep], vectors[keep]
+
+            self._buckets[bucket] = (loaded_at, ids, created, vectors)
+            self.stores += 1
+        except Exception as e:
+            print(f"Warning: response cache write failed: {e}")
+
+    async def invalidate_lesson(self, lesson_id: str):
+        """Drop cached answers for a lesson at every level"""
+        for bucket in [b for b in self._buckets if b.endswith(f":{lesson_id}")]:
+            del self._buckets[bucket]
+        try:
+            await self.redis.delete_pattern(f"response_cache:*:{lesson_id}:*")
+        except Exception as e:
+            print(f"Warning: response cache invalidation failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "avg_lookup_ms": round(self.lookup_ms / lookups, 3) if lookups else 0.0,
+            "avg_hit_similarity": round(self.hit_similarity / self.hits, 4) if self.hits else None,
+            "threshold": self.threshold,
+        }
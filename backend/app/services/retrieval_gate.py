@@ -0,0 +1,113 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+import re
+import unicodedata
+
+from app.core.config import settings
+
+# Marks that a message is asking something, so it is worth retrieving for
+QUESTION_WORDS = {
+    "what", "how", "why", "when", "where", "which", "who", "mean", "means",
+    "say", "translate", "explain", "difference",
+    "מה", "איך", "למה", "מתי", "איפה", "מי", "כמה",
+}
+
+
+@dataclass
+class RetrievalDecision:
+    retrieve: bool
+    reason: str
+
+
+class RetrievalGate:
+    """
+    Decides per turn whether the tutor needs RAG context
+    Greetings, acknowledgements, "continue" and short replies mid-conversation
+    are answered from the conversation alone, saving the embedding and vector
+    query. Lesson-scoped turns always get their precomputed lesson block,
+    which is one cache read. Decisions are counted per reason, with the
+    retrieval time they saved estimated from the average cost of searches
+    """
+
+    def __init__(
+        self,
+        enabled: bool = settings.RETRIEVAL_GATE_ENABLED,
+        skip_phrases: str = settings.RETRIEVAL_GATE_SKIP_PHRASES,
+        short_reply_words: int = settings.RETRIEVAL_GATE_SHORT_REPLY_WORDS,
+    ):
+        self.enabled = enabled
+        self.skip_phrases = {
+            self.normalize(p) for p in skip_phrases.split(",") if p.strip()
+        }
+        self.short_reply_words = short_reply_words
+
+        self.decisions: Dict[str, int] = {}
+        self.skipped = 0
+        self.saved_ms = 0.0
+        # Running cost of searches that did run: (turns, ms)
+        self._search_turns = 0
+        self._search_ms = 0.0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Lowercase, drop niqqud and punctuation, collapse whitespace"""
+        text = unicodedata.normalize("NFD", text.lower())
+        text = "".join(c for c in text if not unicodedata.combining(c))
+        text = re.sub(r"[^\w\s]", " ", text)
+        return re.sub(r"\s+", " ", text).strip()
+
+    def decide(
+        self, message: str, has_history: bool, lesson_id: Optional[str] = None
+    ) -> RetrievalDecision:
+        """Whether to retrieve context for this turn, and why"""
+        decision = self._decide(message, has_history, lesson_id)
+        self.decisions[decision.reason] = self.decisions.get(decision.reason, 0) + 1
+        if not decision.retrieve:
+            self.skipped += 1
+            if self._search_turns:
+                self.saved_ms += self._search_ms / self._search_turns
+        return decision
+
+    def _decide(
+        self, message: str, has_history: bool, lesson_id: Optional[str]
+    ) -> RetrievalDecision:
+        if not self.enabled:
+            return RetrievalDecision(True, "disabled")
+        # Every worker must build the same lesson prompt, and the block is
+        # precomputed, so only the embedding and vector search are gated
+        if lesson_id:
+            return RetrievalDecision(True, "lesson")
+
+        text = self.normalize(message)
+        if not text:
+            return RetrievalDecision(False, "empty")
+        if text in self.skip_phrases:
+            return RetrievalDecision(False, "small_talk")
+
+        words = text.split()
+        if "?" in message or QUESTION_WORDS.intersection(words):
+            return RetrievalDecision(True, "question")
+        # A few words after the tutor has spoken is an answer or a practice
+        # attempt; on a first turn it is usually a word to look up
+        if has_history and len(words) <= self.short_reply_words:
+            return RetrievalDecision(False, "short_reply")
+        return RetrievalDecision(True, "default")
+
+    def record_search(self, duration_ms: float):
+        """Record what a search turn cost, for the saved-latency estimate"""
+        self._search_turns += 1
+        self._search_ms += duration_ms
+
+    def stats(self) -> Dict[str, Any]:
+        total = sum(self.decisions.values())
+        return {
+            "enabled": self.enabled,
+            "decisions": dict(self.decisions),
+            "skip_ratio": round(self.skipped / total, 4) if total else 0.0,
+            "estimated_saved_ms": round(self.saved_ms, 2),
+            "avg_search_ms": (
+                round(self._search_ms / self._search_turns, 2)
+                if self._search_turns
+                else None
+            ),
+        }
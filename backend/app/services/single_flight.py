@@ -0,0 +1,139 @@
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+import time
+
+from app.core.config import settings
+from app.services.redis_service import RedisService, redis_service
+
+Loader = Callable[[], Awaitable[Any]]
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent cache fills so one miss costs one backend fetch
+    Within a worker, callers for the same key share one future; across
+    workers, a short Redis lock elects one filler while the others poll the
+    cache until it is filled (or the lock disappears without a value)
+    """
+
+    def __init__(
+        self,
+        redis_service: RedisService,
+        lock_ttl_ms: int = settings.SINGLE_FLIGHT_LOCK_TTL_MS,
+        wait_ms: int = settings.SINGLE_FLIGHT_WAIT_MS,
+        poll_ms: int = settings.SINGLE_FLIGHT_POLL_MS,
+    ):
+        self.redis = redis_service
+        self.lock_ttl_ms = lock_ttl_ms
+        self.wait_ms = wait_ms
+        self.poll_ms = poll_ms
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+        self.coalesced = 0
+        self.fills = 0
+        self.waits = 0
+        self.wait_hits = 0
+        self.wait_fallbacks = 0
+
+    async def do(self, key: str, fn: Loader) -> Any:
+        """Run fn once per key at a time in this process; joiners share its result"""
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            # Shielded so a cancelled joiner does not cancel the shared fill
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await fn()
+        except BaseException as e:
+            future.set_exception(e)
+            # Joiners re-raise it; this marks it retrieved if there are none
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._in_flight[key]
+
+    async def fill(
+        self,
+        key: str,
+        load: Loader,
+        read: Callable[[], Awaitable[Optional[Any]]],
+    ) -> Any:
+        """
+        Fill key once across all workers
+        load fetches from the backend and writes the cache; read returns the
+        cached value (or None) and is polled while another worker holds the lock
+        """
+        return await self.do(key, lambda: self._fill(key, load, read))
+
+    async def _fill(self, key: str, load: Loader, read) -> Any:
+        lock_key = f"lock:{key}"
+        try:
+            token = await self.redis.acquire_lock(lock_key, self.lock_ttl_ms)
+        except Exception as e:
+            print(f"Warning: single-flight lock unavailable for {key}: {e}")
+            return await load()
+
+        if token:
+            self.fills += 1
+            try:
+                return await load()
+            finally:
+                try:
+                    await self.redis.release_lock(lock_key, token)
+                except Exception as e:
+                    print(f"Warning: failed to release {lock_key}: {e}")
+
+        # Another worker is filling: wait for its result
+        self.waits += 1
+        deadline = time.monotonic() + self.wait_ms / 1000
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_ms / 1000)
+            value = await read()
+            if value is not None:
+                self.wait_hits += 1
+                return value
+            if not await self.redis.exists(lock_key):
+                # Filler finished without caching (e.g. not found) or died
+                break
+
+        self.wait_fallbacks += 1
+        return await load()
+
+    async def revalidate(self, key: str, load: Loader) -> bool:
+        """
+        Reload key for stale-while-revalidate unless another worker already is
+        Returns False if the refresh was skipped
+        """
+        async def refresh():
+            lock_key = f"lock:{key}"
+            token = await self.redis.acquire_lock(lock_key, self.lock_ttl_ms)
+            if not token:
+                return False
+            self.fills += 1
+            try:
+                await load()
+                return True
+            finally:
+                await self.redis.release_lock(lock_key, token)
+
+        return await self.do(f"revalidate:{key}", refresh)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._in_flight),
+            "coalesced": self.coalesced,
+            "fills": self.fills,
+            "waits": self.waits,
+            "wait_hits": self.wait_hits,
+            "wait_fallbacks": self.wait_fallbacks,
+        }
+
+
+# Singleton instance
+single_flight = SingleFlight(redis_service)
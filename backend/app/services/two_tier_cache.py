@@ -0,0 +1,209 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+import asyncio
+import time
+
+from app.core.config import settings
+from app.services.redis_service import RedisService, redis_service
+from app.services.single_flight import SingleFlight, single_flight
+
+
+class TwoTierCache:
+    """
+    Read-through cache with a process-local TTL/LRU tier in front of Redis
+    Invalidations delete the Redis keys and are broadcast on a pub/sub
+    channel so every worker drops its local copies; the short local TTL
+    bounds staleness if a message is missed
+
+    Misses are filled through single-flight, and Redis entries outlive their
+    TTL by stale_ttl so expired values are served while one worker refreshes
+    """
+
+    def __init__(
+        self,
+        redis_service: RedisService,
+        single_flight: SingleFlight,
+        local_max_entries: int = settings.CATALOG_CACHE_LOCAL_MAX_ENTRIES,
+        local_ttl: int = settings.CATALOG_CACHE_LOCAL_TTL,
+        ttl: int = settings.CATALOG_CACHE_TTL,
+        stale_ttl: int = settings.CATALOG_CACHE_STALE_TTL,
+        channel: str = settings.CACHE_INVALIDATION_CHANNEL,
+    ):
+        self.redis = redis_service
+        self.single_flight = single_flight
+        self.local_max_entries = local_max_entries
+        self.local_ttl = local_ttl
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.channel = channel
+        self._local: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._listener: Optional[asyncio.Task] = None
+        self._refreshes: Set[asyncio.Task] = set()
+
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.stale_served = 0
+        self.invalidations_received = 0
+
+    # Local tier
+    def _get_local(self, key: str) -> Optional[Any]:
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._local[key]
+            return None
+        self._local.move_to_end(key)
+        return value
+
+    def _set_local(self, key: str, value: Any):
+        self._local[key] = (time.monotonic() + self.local_ttl, value)
+        self._local.move_to_end(key)
+        while len(self._local) > self.local_max_entries:
+            self._local.popitem(last=False)
+
+    def _drop_local(self, prefix: str):
+        for key in [k for k in self._local if k.startswith(prefix)]:
+            del self._local[key]
+
+    async def get_or_load(
+        self, key: str, loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Return the cached value for key, calling loader on a miss (None is not cached)"""
+        value = self._get_local(key)
+        if value is not None:
+            self.local_hits += 1
+            return value
+
+        entry = await self._read(key)
+        if entry is not None:
+            self.redis_hits += 1
+            if entry["fresh_until"] > time.time():
+                self._set_local(key, entry["value"])
+            else:
+                self.stale_served += 1
+                self._schedule_refresh(key, loader)
+            return entry["value"]
+
+        self.misses += 1
+
+        async def read():
+            entry = await self._read(key)
+            return entry["value"] if entry else None
+
+        return await self.single_flight.fill(
+            key, lambda: self._load(key, loader), read
+        )
+
+    async def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        """The Redis entry ({"value", "fresh_until"}) for key, if any"""
+        try:
+            entry = await self.redis.get(key)
+        except Exception as e:
+            print(f"Warning: cache read failed for {key}: {e}")
+            return None
+        if isinstance(entry, dict) and "fresh_until" in entry:
+            return entry
+        return None
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        value = await loader()
+        if value is not None:
+            self._set_local(key, value)
+            entry = {"value": value, "fresh_until": time.time() + self.ttl}
+            try:
+                await self.redis.set(key, entry, self.ttl + self.stale_ttl)
+            except Exception as e:
+                print(f"Warning: cache write failed for {key}: {e}")
+        return value
+
+    def _schedule_refresh(self, key: str, loader: Callable[[], Awaitable[Any]]):
+        async def refresh():
+            try:
+                await self.single_flight.revalidate(
+                    key, lambda: self._load(key, loader)
+                )
+            except Exception as e:
+                print(f"Warning: cache refresh failed for {key}: {e}")
+
+        task = asyncio.create_task(refresh())
+        self._refreshes.add(task)
+        task.add_done_callback(self._refreshes.discard)
+
+    async def invalidate(self, prefix: str):
+        """Drop every key starting with prefix in Redis and in all workers"""
+        self._drop_local(prefix)
+        try:
+            await self.redis.delete_pattern(f"{prefix}*")
+            await self.redis.redis_client.publish(self.channel, prefix)
+        except Exception as e:
+            print(f"Warning: cache invalidation failed for {prefix}: {e}")
+
+    # Pub/sub listener
+    async def start(self):
+        """Start listening for invalidations from other workers"""
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def _listen(self):
+        while True:
+            try:
+                if not self.redis.redis_client:
+                    await self.redis.connect()
+                client = self.redis.redis_client
+                pubsub = client.pubsub()
+                await pubsub.subscribe(self.channel)
+                try:
+                    # Resubscribe when RedisService switches backends
+                    while self.redis.redis_client is client:
+                        message = await pubsub.get_message(
+                            ignore_subscribe_messages=True, timeout=1.0
+                        )
+                        if message is None:
+                            continue
+                        self.invalidations_received += 1
+                        self._drop_local(message["data"].decode("utf-8"))
+                finally:
+                    await pubsub.close()
+                # Invalidations may have been missed during the switch
+                self._local.clear()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Entries already cached locally may be stale until the
+                # connection is back, so start from an empty local tier
+                print(f"Warning: cache invalidation listener error: {e}")
+                self._local.clear()
+                await asyncio.sleep(1)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.local_hits + self.redis_hits + self.misses
+        redis_lookups = self.redis_hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "stale_served": self.stale_served,
+            "local_hit_ratio": round(self.local_hits / lookups, 4) if lookups else 0.0,
+            # Share of local misses that Redis answered
+            "redis_hit_ratio": (
+                round(self.redis_hits / redis_lookups, 4) if redis_lookups else 0.0
+            ),
+            "local_entries": len(self._local),
+            "invalidations_received": self.invalidations_received,
+        }
+
+
+# Singleton instance for course and lesson catalog reads
+catalog_cache = TwoTierCache(redis_service, single_flight)
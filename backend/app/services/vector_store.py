@@ -0,0 +1,188 @@
+from abc import ABC, abstractmethod
+from typing import List, Dict, Optional, Any
+import asyncio
+import json
+
+from app.core.config import settings
+
+
+def _parse_json_field(value: Any) -> Any:
+    """Lesson JSON columns are sometimes stored as serialized strings"""
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return None
+    return value
+
+
+def build_lesson_chunks(lesson_id: str, content: Dict) -> List[Dict[str, Any]]:
+    """
+    Split lesson content into the chunks indexed for RAG
+    Returns [{"id": ..., "text": ..., "metadata": {...}}] without embeddings
+    """
+    chunks = []
+
+    # Index vocabulary
+    vocabulary = _parse_json_field(content.get("vocabulary"))
+    if isinstance(vocabulary, list):
+        for idx, vocab in enumerate(vocabulary):
+            if not isinstance(vocab, dict) or not vocab.get("hebrew"):
+                continue
+            text = f"{vocab['hebrew']} - {vocab.get('english', '')}"
+            if vocab.get("example"):
+                text += f" Example: {vocab['example']}"
+
+            metadata = {
+                "lesson_id": lesson_id,
+                "type": "vocabulary",
+                "text": text,
+                "hebrew": vocab["hebrew"],
+                "english": vocab.get("english", ""),
+            }
+            if vocab.get("transliteration"):
+                metadata["transliteration"] = vocab["transliteration"]
+            chunks.append(
+                {"id": f"{lesson_id}_vocab_{idx}", "text": text, "metadata": metadata}
+            )
+
+    # Index grammar points (a list of rules, or {"points": [...]})
+    grammar = _parse_json_field(content.get("grammar"))
+    if isinstance(grammar, dict):
+        grammar = grammar.get("points", [])
+    if isinstance(grammar, list):
+        for idx, point in enumerate(grammar):
+            if isinstance(point, dict):
+                text = f"{point.get('rule', '')} Example: {point.get('example', '')}"
+            else:
+                text = str(point)
+            chunks.append(
+                {
+                    "id": f"{lesson_id}_grammar_{idx}",
+                    "text": text,
+                    "metadata": {
+                        "lesson_id": lesson_id,
+                        "type": "grammar",
+                        "text": text,
+                    },
+                }
+            )
+
+    # Index main sections
+    for section_type in ("title", "description"):
+        text = content.get(section_type, "")
+        if text:
+            chunks.append(
+                {
+                    "id": f"{lesson_id}_{section_type}",
+                    "text": text,
+                    "metadata": {
+                        "lesson_id": lesson_id,
+                        "type": section_type,
+                        "text": text,
+                    },
+                }
+            )
+
+    return chunks
+
+
+class VectorStore(ABC):
+    """Interface implemented by the retrieval backends used for RAG"""
+
+    @abstractmethod
+    async def upsert_vectors_async(
+        self, vectors: List[Dict[str, Any]], namespace: str = ""
+    ) -> Any:
+        """
+        Upsert vectors
+
+        vectors format: [
+            {
+                "id": "unique_id",
+                "values": [0.1, 0.2, ...],  # embedding
+                "metadata": {"text": "...", "lesson_id": "...", "type": "..."}
+            }
+        ]
+        """
+
+    @abstractmethod
+    async def query_async(
+        self,
+        query_vector: List[float],
+        top_k: int = 5,
+        filter: Optional[Dict] = None,
+        namespace: str = "",
+        include_metadata: bool = True,
+        include_values: bool = False,
+    ) -> Dict:
+        """
+        Return {"matches": [{"id", "score", "metadata"}, ...]} best first
+        With include_values each match also carries its "values"
+        """
+
+    @abstractmethod
+    async def delete_async(
+        self,
+        ids: Optional[List[str]] = None,
+        delete_all: bool = False,
+        namespace: str = "",
+        filter: Optional[Dict] = None,
+    ) -> Any:
+        """Delete vectors by id, by metadata filter, or all of them"""
+
+    def close(self):
+        """Release resources held by the backend"""
+
+    async def index_lesson_content(
+        self, lesson_id: str, content: Dict, embedding_function
+    ) -> int:
+        """Embed and index lesson content, returning the number of vectors"""
+        chunks = build_lesson_chunks(lesson_id, content)
+        if not chunks:
+            return 0
+
+        # Embed concurrently so the requests can share batched API calls
+        embeddings = await asyncio.gather(
+            *(embedding_function(chunk["text"]) for chunk in chunks)
+        )
+
+        vectors = [
+            {"id": chunk["id"], "values": embedding, "metadata": chunk["metadata"]}
+            for chunk, embedding in zip(chunks, embeddings)
+        ]
+        await self.upsert_vectors_async(vectors)
+        return len(vectors)
+
+
+_vector_store: Optional[VectorStore] = None
+
+
+def get_vector_store() -> VectorStore:
+    """Return the configured vector store backend (created on first use)"""
+    global _vector_store
+    if _vector_store is None:
+        backend = settings.VECTOR_STORE_BACKEND
+        if backend == "local":
+            from app.services.local_vector_store import LocalVectorStore
+
+            _vector_store = LocalVectorStore()
+        elif backend == "pgvector":
+            from app.services.pgvector_store import PgVectorStore
+
+            _vector_store = PgVectorStore()
+        elif backend == "pinecone":
+            from app.services.pinecone_service import PineconeService
+
+            _vector_store = PineconeService()
+        else:
+            raise ValueError(f"Unknown VECTOR_STORE_BACKEND: {backend}")
+    return _vector_store
+
+
+def close_vector_store():
+    """Release the vector store backend, if one was created"""
+    global _vector_store
+    if _vector_store is not None:
+        _vector_store.close()
+        _vector_store = None
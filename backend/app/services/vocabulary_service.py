@@ -2,6 +2,7 @@ from typing import List, Dict, Any, Optional
 from datetime import datetime
 import json
 from app.core.database import prisma
+from app.services.redis_service import redis_service
 
 
 class VocabularyService:
@@ -298,6 +299,14 @@ class VocabularyService:
             }
         )
 
+        # Practice counters live in Redis and reach Postgres in batches
+        try:
+            await redis_service.track_vocabulary_practice(
+                review_item.userId, review_item.vocabularyId, quality >= 3
+            )
+        except Exception as e:
+            print(f"Warning: failed to track vocabulary practice: {e}")
+
         return {
             "nextReview": next_review,
             "interval": interval,
@@ -0,0 +1,243 @@
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import time
+
+from prisma.errors import DataError
+
+from app.core.config import settings
+from app.core.database import prisma
+
+
+class MessageWriteQueue:
+    """
+    In-process write-behind queue for chat persistence
+    Conversations and messages are buffered and inserted with create_many by
+    a background flusher once WRITE_QUEUE_MAX_BATCH rows are pending or every
+    WRITE_QUEUE_FLUSH_INTERVAL seconds; the queue is drained on shutdown
+
+    Connection and other transient errors keep every row queued and retry
+    with exponential backoff for as long as the outage lasts. Only data
+    errors (foreign key, unique, missing values) count toward dropping a
+    conversation's rows after max_attempts
+    """
+
+    def __init__(
+        self,
+        db=prisma,
+        max_batch: int = settings.WRITE_QUEUE_MAX_BATCH,
+        flush_interval: float = settings.WRITE_QUEUE_FLUSH_INTERVAL,
+        max_attempts: int = 3,
+        max_backoff: float = settings.WRITE_QUEUE_MAX_BACKOFF,
+    ):
+        self.db = db
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+        # Current retry delay after a transient failure, 0 while healthy
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self._conversations: List[Dict[str, Any]] = []
+        self._messages: List[Dict[str, Any]] = []
+        # Data-error attempts per conversation, for rows being retried
+        self._attempts: Dict[str, int] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self.flushed_conversations = 0
+        self.flushed_messages = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.dropped_rows = 0
+        self.last_flush_ms = 0.0
+
+    @property
+    def depth(self) -> int:
+        return len(self._conversations) + len(self._messages)
+
+    def enqueue_conversation(self, data: Dict[str, Any]):
+        """Queue a Conversation row (must carry its own id)"""
+        self._conversations.append(data)
+        self._maybe_wake()
+
+    def enqueue_messages(self, messages: List[Dict[str, Any]]):
+        """Queue Message rows; their conversation must already be queued or stored"""
+        self._messages.extend(messages)
+        self._maybe_wake()
+
+    def _maybe_wake(self):
+        if self._wake is not None and self.depth >= self.max_batch:
+            self._wake.set()
+
+    async def start(self):
+        """Start the background flusher"""
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._stopping = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and write everything still queued"""
+        if self._task is not None:
+            # Signalled rather than cancelled: a cancel landing mid-flush
+            # would lose the rows that flush had already taken off the queue
+            self._stopping.set()
+            self._wake.set()
+            await self._task
+            self._task = None
+
+        # Rows with data errors are dropped after max_attempts; an outage
+        # gets max_attempts backed-off retries before the rest is given up
+        outages = 0
+        while self.depth:
+            await self.flush()
+            if not self._backoff:
+                continue
+            outages += 1
+            if outages >= self.max_attempts:
+                print(f"Error: database unavailable, dropping {self.depth} queued chat rows")
+                self.dropped_rows += self.depth
+                self._conversations, self._messages = [], []
+                break
+            await asyncio.sleep(self._backoff)
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if time.monotonic() < self._retry_at:
+                continue
+            await self.flush()
+
+    async def flush(self) -> bool:
+        """Write the queued rows; returns False if any of them had to be retried"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        async with self._flush_lock:
+            if not self.depth:
+                return True
+
+            conversations, self._conversations = self._conversations, []
+            messages, self._messages = self._messages, []
+            started = time.perf_counter()
+
+            try:
+                # Conversations first so the messages' foreign keys resolve
+                if conversations:
+                    await self.db.conversation.create_many(
+                        data=conversations, skip_duplicates=True
+                    )
+                    self.flushed_conversations += len(conversations)
+                    # Already stored; the fallback only needs the messages
+                    conversations = []
+                if messages:
+                    await self.db.message.create_many(data=messages)
+                    self.flushed_messages += len(messages)
+            except DataError as e:
+                # The batch mixes many users' rows; write it conversation by
+                # conversation so one bad row only holds up its own session
+                self.failed_flushes += 1
+                print(f"Warning: chat write batch failed, writing per conversation: {e}")
+                ok = await self._flush_per_conversation(conversations, messages)
+            except Exception as e:
+                self.failed_flushes += 1
+                self._requeue(conversations, messages)
+                self._back_off(e)
+                ok = False
+            else:
+                ok = True
+                self._attempts.clear()
+                self._backoff = 0.0
+
+            self.flushes += 1
+            self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+            return ok
+
+    def _requeue(
+        self, conversations: List[Dict[str, Any]], messages: List[Dict[str, Any]]
+    ):
+        self._conversations = conversations + self._conversations
+        self._messages = messages + self._messages
+
+    def _back_off(self, error: Exception):
+        self._backoff = min(
+            max(self._backoff * 2, self.flush_interval), self.max_backoff
+        )
+        self._retry_at = time.monotonic() + self._backoff
+        print(
+            f"Warning: chat writes failed, retrying in {self._backoff:.1f}s "
+            f"({self.depth} rows queued): {error}"
+        )
+
+    async def _flush_per_conversation(
+        self, conversations: List[Dict[str, Any]], messages: List[Dict[str, Any]]
+    ) -> bool:
+        groups: Dict[str, Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]] = {}
+        for conversation in conversations:
+            groups.setdefault(conversation["id"], ([], []))[0].append(conversation)
+        for message in messages:
+            groups.setdefault(message["conversationId"], ([], []))[1].append(message)
+
+        ok = True
+        pending = list(groups.items())
+        for index, (conversation_id, group) in enumerate(pending):
+            group_conversations, group_messages = group
+            try:
+                if group_conversations:
+                    await self.db.conversation.create_many(
+                        data=group_conversations, skip_duplicates=True
+                    )
+                    self.flushed_conversations += len(group_conversations)
+                    group_conversations = []
+                if group_messages:
+                    await self.db.message.create_many(data=group_messages)
+                    self.flushed_messages += len(group_messages)
+                self._attempts.pop(conversation_id, None)
+                self._backoff = 0.0
+            except DataError as e:
+                ok = False
+                rows = len(group_conversations) + len(group_messages)
+                attempts = self._attempts.get(conversation_id, 0) + 1
+                if attempts >= self.max_attempts:
+                    print(
+                        f"Error writing conversation {conversation_id}, "
+                        f"dropping {rows} rows: {e}"
+                    )
+                    self.dropped_rows += rows
+                    self._attempts.pop(conversation_id, None)
+                else:
+                    self._attempts[conversation_id] = attempts
+                    self._requeue(group_conversations, group_messages)
+            except Exception as e:
+                # The database went away mid-fallback: keep this group and
+                # the ones not tried yet, without counting an attempt
+                for _, (rest_conversations, rest_messages) in pending[index + 1:]:
+                    self._requeue(rest_conversations, rest_messages)
+                self._requeue(group_conversations, group_messages)
+                self._back_off(e)
+                return False
+        return ok
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "pending_conversations": len(self._conversations),
+            "pending_messages": len(self._messages),
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "flushed_conversations": self.flushed_conversations,
+            "flushed_messages": self.flushed_messages,
+            "dropped_rows": self.dropped_rows,
+            "retry_backoff_s": self._backoff,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+
+# Singleton instance
+message_write_queue = MessageWriteQueue()